@@ -0,0 +1,125 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import engine
+from archive import EXPORT_EXTENSIONS, export_stem
+
+
+def find_exports(directory: str) -> list[str]:
+    """
+        Lists the EBO exports found directly inside a folder, compressed ones
+        (`.xml.gz`, `.zip`) included.
+
+        Args:
+            directory: The folder holding one export per server.
+
+        Returns:
+            The sorted paths of the exports.
+    """
+    return sorted(
+        os.path.join(directory, entry)
+        for entry in os.listdir(directory)
+        if entry.lower().endswith(EXPORT_EXTENSIONS) and os.path.isfile(os.path.join(directory, entry))
+    )
+
+
+def collisions(exports: list[str]) -> dict[str, list[str]]:
+    """
+        Finds the exports that would be written to the same chart file, e.g.
+        `site.xml` and `site.xml.gz`. Names are compared ignoring case, like
+        the file system of the interface does.
+
+        Args:
+            exports: The paths of the exports, see `find_exports`.
+
+        Returns:
+            A dictionary mapping each export sharing its name with others to the
+            paths of those others.
+    """
+    by_name = {}
+    for path in exports:
+        by_name.setdefault(export_stem(path).lower(), []).append(path)
+    return {
+        path: [other for other in paths if other != path]
+        for paths in by_name.values() if len(paths) > 1
+        for path in paths
+    }
+
+
+def collision_message(others: list[str]) -> str:
+    """
+        Returns the error of an export whose chart file would overwrite the one of others.
+    """
+    return f"ERROR: {', '.join(os.path.basename(other) for other in others)} would be written to the same chart file, rename one of them"
+
+
+def build_on_pool(exports: list[str], workers: int, summary: dict, *args) -> list[str]:
+    """
+        Builds exports with `engine.build_export` on a new process pool.
+
+        Args:
+            exports: The paths of the exports.
+            workers: The number of processes, one per core if None.
+            summary: Receives the result of every export built, by path.
+            args: The other arguments of `engine.build_export`.
+
+        Returns:
+            The exports left unbuilt because a worker died, in order.
+    """
+    unbuilt = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {path: pool.submit(engine.build_export, path, *args) for path in exports}
+        for path, future in futures.items():
+            try:
+                summary[path] = future.result()
+            except BrokenProcessPool:
+                unbuilt.append(path)
+            except Exception as e:
+                summary[path] = (False, f"ERROR: {str(e)}")
+    return unbuilt
+
+
+def build_directory(directory: str, output_dir: str = engine.OUTPUT_DIR, workers: int = None,
+                    output_format: str = "xml") -> dict:
+    """
+        Builds the charts of every export in a folder, spread across a process pool.
+
+        Each export is written to `{output_dir}/{export name}.xml`. A file that
+        fails does not stop the others, its error is reported in the summary,
+        even when it kills its process (e.g. out of memory).
+        Exports that would be written to the same file (see `collisions`) are
+        all reported and none of them is built.
+
+        Args:
+            directory: The folder holding the exports.
+            output_dir: The folder the chart files are written to.
+            workers: The number of processes, one per core if None.
+            output_format: "xml", "gz" or "zip", see `engine.build`.
+
+        Returns:
+            A dictionary mapping every export path to a tuple containing a
+            boolean indicating success and a message string.
+    """
+    exports = find_exports(directory)
+    summary = {}
+    if not exports:
+        return summary
+
+    clashing = collisions(exports)
+    for path, others in clashing.items():
+        summary[path] = (False, collision_message(others))
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    args = ("", output_dir, output_format)
+    unbuilt = build_on_pool([path for path in exports if path not in clashing], workers, summary, *args)
+    # A worker that died (e.g. out of memory) breaks the pool and every file still
+    # queued with it. Those are built again one process at a time, so the first one
+    # that breaks its pool is the one that crashed and only it fails.
+    while unbuilt:
+        unbuilt = build_on_pool(unbuilt, 1, summary, *args)
+        if unbuilt:
+            summary[unbuilt.pop(0)] = (False, "ERROR: the process building this export died (e.g. out of memory)")
+
+    return {path: summary[path] for path in exports}
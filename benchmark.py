@@ -0,0 +1,435 @@
+"""
+    Benchmark suite of Chart Replicator.
+
+    Every benchmark runs on synthetic exports (see `synthetic.py`) of the
+    requested sizes and reports its time, throughput and peak Python memory
+    (tracemalloc, measured in a separate run so it does not slow the timing).
+    Results are compared with a stored baseline, the run fails when one of
+    them is slower or bigger than the baseline plus the tolerance, or has no
+    baseline stored (see `--save-baseline`).
+
+    The `end-to-end-*` benchmarks import the export and write the charts in
+    one go, from and to plain XML, gzip and zip files, to compare what
+    compression costs against the bytes it saves.
+
+    The `startup` benchmark does not depend on the size: it launches a fresh
+    interpreter, imports `main` and times how long the main window takes to
+    show. It also fails when it goes over `--startup-budget` seconds.
+
+    Examples:
+        python benchmark.py --sizes 100 10000 100000
+        python benchmark.py --save-baseline
+        python benchmark.py --only parse write --sizes 1000000
+        python benchmark.py --only end-to-end-xml end-to-end-gz end-to-end-zip --sizes 1000000
+        python benchmark.py --only startup --startup-budget 0.8
+"""
+import argparse
+import filecmp
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import engine
+import synthetic
+from archive import OUTPUT_FORMATS, open_output
+from importer import parse_export
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+DEFAULT_SIZES = (100, 10000, 100000)
+DEFAULT_TOLERANCE = 0.25
+STARTUP = "startup"
+STARTUP_BUDGET = 1.0
+
+# Run in a fresh interpreter, so the imports are timed cold
+STARTUP_SCRIPT = """
+import sys
+from PyQt5.QtWidgets import QApplication
+import main
+app = QApplication(sys.argv)
+window = main.MyWidget()
+window.show()
+app.processEvents()
+"""
+
+BENCHMARKS = {}
+
+
+def benchmark(name: str):
+    """
+        Registers a benchmark.
+
+        The decorated function receives the benchmark `Workspace` and returns a
+        callable doing the measured work, which returns the number of bytes
+        it read or wrote (0 if it does not apply).
+    """
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+class Workspace:
+    """
+        Synthetic export of one size and what the benchmarks derive from it.
+
+        Exports are generated once per size and the parsed context once per
+        workspace, so the benchmarks only time their own phase.
+    """
+    def __init__(self, directory: str, size: int):
+        self.directory = directory
+        self.size = size
+        self.export_path = os.path.join(directory, f"export-{size}.xml")
+        self._context = None
+
+        if not os.path.exists(self.export_path):
+            synthetic.write_export(self.export_path, size)
+
+    @property
+    def context(self) -> dict:
+        if self._context is None:
+            result = parse_export(self.export_path)
+            self._context = engine.context_from_result(result)
+        return self._context
+
+    @property
+    def trend_names(self) -> list[str]:
+        context = self.context
+        return [item["name"] for item in context["trendNameAnalog"] + context["trendNameBinary"]]
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def export(self, output_format: str = "xml") -> str:
+        """
+            Returns the export of this size in a format, compressed from the plain one the first time.
+        """
+        path = os.path.join(self.directory, f"export-{self.size}{OUTPUT_FORMATS[output_format]}")
+        if not os.path.exists(path):
+            with open(self.export_path, "rb") as source, open_output(path) as destination:
+                shutil.copyfileobj(source, destination, 1 << 20)
+        return path
+
+
+@benchmark("parse")
+def bench_parse(workspace: Workspace):
+    """
+        `parse_xml_file`: streaming import of the export.
+    """
+    size = os.path.getsize(workspace.export_path)
+
+    def run():
+        parse_export(workspace.export_path)
+        return size
+    return run
+
+
+@benchmark("render")
+def bench_render(workspace: Workspace):
+    """
+        `format_xml` rendering with the Jinja2 template only, the chunks are counted and dropped.
+    """
+    context = workspace.context
+    engine.get_template()
+
+    def run():
+        return sum(len(chunk) for chunk in engine.stream(context))
+    return run
+
+
+@benchmark("emit")
+def bench_emit(workspace: Workspace):
+    """
+        `format_xml` rendering with the native emitter only, the blocks are counted and dropped.
+    """
+    context = workspace.context
+
+    def run():
+        return sum(len(block) for block in engine.encoded_stream(context))
+    return run
+
+
+@benchmark("write")
+def bench_write(workspace: Workspace):
+    """
+        `format_xml` rendering streamed to disk, native emitter (the default).
+    """
+    context = workspace.context
+    path = workspace.path("charts.xml")
+
+    def run():
+        engine.write(context, path)
+        return os.path.getsize(path)
+    return run
+
+
+@benchmark("write-jinja")
+def bench_write_jinja(workspace: Workspace):
+    """
+        `format_xml` rendering streamed to disk with the Jinja2 template.
+
+        Also checks once that both renderers give the same bytes.
+    """
+    context = workspace.context
+    path = workspace.path("charts-jinja.xml")
+    native_path = workspace.path("charts-native.xml")
+    engine.write(context, path, template=engine.DEFAULT_TEMPLATE)
+    engine.write(context, native_path)
+    if not filecmp.cmp(path, native_path, shallow=False):
+        raise AssertionError(f"the native emitter and the Jinja2 template differ for {workspace.size} trends")
+
+    def run():
+        engine.write(context, path, template=engine.DEFAULT_TEMPLATE)
+        return os.path.getsize(path)
+    return run
+
+
+def end_to_end(workspace: Workspace, output_format: str):
+    """
+        Imports the export and writes its charts, both in the same format.
+
+        The bytes are the ones written to disk, the compressed size for gzip and zip.
+    """
+    export = workspace.export(output_format)
+    path = workspace.path(f"charts{OUTPUT_FORMATS[output_format]}")
+
+    def run():
+        engine.write(engine.context_from_result(parse_export(export)), path)
+        return os.path.getsize(path)
+    return run
+
+
+@benchmark("end-to-end-xml")
+def bench_end_to_end_xml(workspace: Workspace):
+    """
+        `parse_xml_file` then `format_xml`, plain XML in and out.
+    """
+    return end_to_end(workspace, "xml")
+
+
+@benchmark("end-to-end-gz")
+def bench_end_to_end_gz(workspace: Workspace):
+    """
+        `parse_xml_file` then `format_xml`, `.xml.gz` in and out.
+    """
+    return end_to_end(workspace, "gz")
+
+
+@benchmark("end-to-end-zip")
+def bench_end_to_end_zip(workspace: Workspace):
+    """
+        `parse_xml_file` then `format_xml`, `.zip` in and out.
+    """
+    return end_to_end(workspace, "zip")
+
+
+@benchmark("popup")
+def bench_popup(workspace: Workspace):
+    """
+        `DisplayTypePopup` construction under the offscreen Qt platform.
+
+        Only the Python side of the memory is measured, Qt allocations are not
+        seen by tracemalloc.
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    try:
+        from PyQt5.QtWidgets import QApplication
+    except ImportError:
+        return None
+
+    app = QApplication.instance() or QApplication([])
+    from main import DisplayTypePopup
+    from styles import DISPLAY_TYPES
+    names = workspace.trend_names
+
+    def run():
+        popup = DisplayTypePopup(names, DISPLAY_TYPES)
+        app.processEvents()
+        popup.deleteLater()
+        return 0
+    return run
+
+
+def measure_startup(repeat: int) -> dict:
+    """
+        Times the launch of the GUI, from a new interpreter to the shown main window.
+
+        Args:
+            repeat: How many launches, the best one is kept.
+
+        Returns:
+            A dictionary with seconds, bytes and peak_bytes, or None if PyQt5 is missing.
+    """
+    try:
+        import PyQt5.QtWidgets  # noqa: F401
+    except ImportError:
+        return None
+
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    directory = os.path.dirname(os.path.abspath(__file__))
+
+    seconds = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], cwd=directory, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+
+    # Qt allocations are not seen by tracemalloc, only the time is measured
+    return {"seconds": seconds, "bytes": 0, "peak_bytes": 0}
+
+
+def measure(run, repeat: int) -> dict:
+    """
+        Times a benchmark and measures its peak memory.
+
+        Args:
+            run: The callable doing the measured work.
+            repeat: How many timed runs, the best one is kept.
+
+        Returns:
+            A dictionary with seconds, bytes and peak_bytes.
+    """
+    seconds = None
+    processed = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        processed = run()
+        elapsed = time.perf_counter() - start
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {"seconds": seconds, "bytes": processed, "peak_bytes": peak}
+
+
+def run_benchmarks(sizes, names, repeat: int, directory: str) -> dict:
+    """
+        Runs the chosen benchmarks on every size.
+
+        Returns:
+            A dictionary mapping "{benchmark}@{size}" to its measures.
+    """
+    results = {}
+    if STARTUP in names:
+        measures = measure_startup(repeat)
+        if measures is None:
+            print(f"{STARTUP}: skipped (dependency missing)")
+        else:
+            measures["trends"] = 0
+            results[STARTUP] = measures
+            print(report_line(STARTUP, measures))
+        names = [name for name in names if name != STARTUP]
+
+    for size in sizes:
+        workspace = Workspace(directory, size)
+        for name in names:
+            run = BENCHMARKS[name](workspace)
+            if run is None:
+                print(f"{name}@{size}: skipped (dependency missing)")
+                continue
+            measures = measure(run, repeat)
+            measures["trends"] = size
+            results[f"{name}@{size}"] = measures
+            print(report_line(f"{name}@{size}", measures))
+    return results
+
+
+def report_line(key: str, measures: dict) -> str:
+    seconds = measures["seconds"]
+    line = f"{key:<24} {seconds * 1000:10.1f} ms"
+    if measures["trends"]:
+        line += f" {measures['trends'] / seconds:12,.0f} trends/s"
+    if measures["bytes"]:
+        line += f" {measures['bytes'] / seconds / 1e6:8.1f} MB/s"
+    return line + f"   peak {measures['peak_bytes'] / 1e6:8.1f} MB"
+
+
+def regressions(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+        Compares results with the baseline.
+
+        Args:
+            results: The measures of this run.
+            baseline: The stored measures.
+            tolerance: How much slower or bigger a result may be, 0.25 is 25 %.
+
+        Returns:
+            A message per regression, empty if there is none.
+    """
+    messages = []
+    for key, measures in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        for metric in ("seconds", "peak_bytes"):
+            if reference[metric] and measures[metric] > reference[metric] * (1 + tolerance):
+                messages.append(f"{key}: {metric} {measures[metric]:.4g} > baseline {reference[metric]:.4g}")
+    return messages
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Runs the Chart Replicator benchmarks.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="numbers of trends")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS) + [STARTUP], help="benchmarks to run")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark, the best is kept")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline file")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed regression, 0.25 is 25 %%")
+    parser.add_argument("--startup-budget", type=float, default=STARTUP_BUDGET,
+                        help="longest allowed time to the main window, in seconds")
+    parser.add_argument("--workdir", help="folder for the synthetic exports, a temporary one by default")
+    args = parser.parse_args(argv)
+
+    names = args.only or [STARTUP] + list(BENCHMARKS)
+    if args.workdir:
+        os.makedirs(args.workdir, exist_ok=True)
+        results = run_benchmarks(args.sizes, names, args.repeat, args.workdir)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            results = run_benchmarks(args.sizes, names, args.repeat, directory)
+
+    budget_exceeded = STARTUP in results and results[STARTUP]["seconds"] > args.startup_budget
+    if budget_exceeded:
+        print(f"OVER BUDGET {STARTUP}: {results[STARTUP]['seconds']:.3f} s > {args.startup_budget:.3f} s", file=sys.stderr)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, "r", encoding="utf-8") as file:
+                baseline = json.load(file)
+        baseline.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(baseline, file, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+        return 1 if budget_exceeded else 0
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+
+    # A check that compares nothing must not pass
+    missing = [key for key in results if key not in baseline]
+    for key in missing:
+        print(f"NO BASELINE {key}, run with --save-baseline to create one", file=sys.stderr)
+
+    failures = regressions(results, baseline, args.tolerance)
+    for message in failures:
+        print(f"REGRESSION {message}", file=sys.stderr)
+    return 1 if failures or missing or budget_exceeded else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,221 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import zlib
+
+import metrics
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+CACHE_FILE = os.path.join(CACHE_DIR, "exports.sqlite3")
+MAX_ENTRIES = 32
+# Bumped whenever `importer.parse_export` returns new information, older entries are dropped
+RESULT_VERSION = 4
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS exports (
+    hash TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    result BLOB NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    hash TEXT NOT NULL
+);
+"""
+
+
+def file_hash(path: str) -> str:
+    """
+        Hashes the content of a file.
+
+        Args:
+            path: The file to hash.
+
+        Returns:
+            The SHA-256 hex digest of the file.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def connect(cache_file: str = CACHE_FILE) -> sqlite3.Connection:
+    """
+        Opens the cache database, creating it if needed and emptying it if
+        it holds results of an older `RESULT_VERSION`.
+
+        Args:
+            cache_file: The SQLite file of the cache.
+
+        Returns:
+            The open connection.
+    """
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    connection = sqlite3.connect(cache_file, timeout=30)
+    connection.executescript(SCHEMA)
+    if connection.execute("PRAGMA user_version").fetchone()[0] != RESULT_VERSION:
+        with connection:
+            connection.execute("DELETE FROM files")
+            connection.execute("DELETE FROM exports")
+            connection.execute(f"PRAGMA user_version = {RESULT_VERSION}")
+    return connection
+
+
+def lookup(connection: sqlite3.Connection, path: str, size: int, mtime_ns: int):
+    """
+        Finds the cached result of a file that has not changed since it was cached.
+
+        Nothing is read from the export, only its metadata is compared.
+
+        Args:
+            connection: The cache database.
+            path: The absolute path of the export.
+            size: The size of the export in bytes.
+            mtime_ns: The modification time of the export.
+
+        Returns:
+            The cached result, or None on a miss.
+    """
+    row = connection.execute(
+        "SELECT e.hash, e.result FROM files f JOIN exports e ON e.hash = f.hash "
+        "WHERE f.path = ? AND f.size = ? AND f.mtime_ns = ?",
+        (path, size, mtime_ns)
+    ).fetchone()
+    if row is None:
+        return None
+
+    connection.execute("UPDATE exports SET last_used = ? WHERE hash = ?", (time.time(), row[0]))
+    return json.loads(zlib.decompress(row[1]))
+
+
+def lookup_content(connection: sqlite3.Connection, path: str, size: int, mtime_ns: int, digest: str):
+    """
+        Finds the cached result of an export with the same content, e.g. a copy
+        or a file that was only touched, and links the file to it.
+
+        Args:
+            connection: The cache database.
+            path: The absolute path of the export.
+            size: The size of the export in bytes.
+            mtime_ns: The modification time of the export.
+            digest: The content hash of the export.
+
+        Returns:
+            The cached result, or None on a miss.
+    """
+    row = connection.execute("SELECT result FROM exports WHERE hash = ? AND size = ?", (digest, size)).fetchone()
+    if row is None:
+        return None
+
+    connection.execute("UPDATE exports SET last_used = ? WHERE hash = ?", (time.time(), digest))
+    connection.execute(
+        "INSERT OR REPLACE INTO files (path, size, mtime_ns, hash) VALUES (?, ?, ?, ?)",
+        (path, size, mtime_ns, digest)
+    )
+    return json.loads(zlib.decompress(row[0]))
+
+
+def store(connection: sqlite3.Connection, path: str, size: int, mtime_ns: int, digest: str, result: dict):
+    """
+        Saves the result of an export and evicts the least recently used entries.
+
+        Args:
+            connection: The cache database.
+            path: The absolute path of the export.
+            size: The size of the export in bytes.
+            mtime_ns: The modification time of the export.
+            digest: The content hash of the export.
+            result: The dictionary returned by `importer.parse_export`.
+    """
+    blob = zlib.compress(json.dumps(result, separators=(",", ":")).encode("utf-8"))
+    connection.execute(
+        "INSERT OR REPLACE INTO exports (hash, size, result, last_used) VALUES (?, ?, ?, ?)",
+        (digest, size, blob, time.time())
+    )
+    connection.execute(
+        "INSERT OR REPLACE INTO files (path, size, mtime_ns, hash) VALUES (?, ?, ?, ?)",
+        (path, size, mtime_ns, digest)
+    )
+    connection.execute(
+        "DELETE FROM exports WHERE hash NOT IN (SELECT hash FROM exports ORDER BY last_used DESC LIMIT ?)",
+        (MAX_ENTRIES,)
+    )
+    connection.execute("DELETE FROM files WHERE hash NOT IN (SELECT hash FROM exports)")
+
+
+def parse_export_cached(path: str, progress=None, cache_file: str = CACHE_FILE) -> dict:
+    """
+        Same as `importer.parse_export`, but remembers the result on disk.
+
+        An export is found again by its path, size and modification time without
+        reading it. Otherwise its content is hashed, which is much cheaper than
+        parsing, so a copy or a file that was only touched is served from the
+        cache as well. Only new content is parsed. If the cache can't be used the
+        export is simply parsed.
+
+        Args:
+            path: The EBO export.
+            progress: Optional callable, receives the number of trends read so far.
+            cache_file: The SQLite file of the cache.
+
+        Returns:
+            A dictionary with the parsed information.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+
+    with metrics.span("parse", file=path, bytes=stat.st_size) as entry:
+        entry["cached"] = True
+        result = _parse_export_cached(path, stat, progress, cache_file, entry)
+        entry["trends"] = trend_count(result)
+        return result
+
+
+def trend_count(result: dict) -> int:
+    """
+        Counts the trends of a parsed export.
+    """
+    return sum(len(names) for names in (result["Trends"] or {}).values())
+
+
+def _parse_export_cached(path: str, stat: os.stat_result, progress, cache_file: str, entry: dict) -> dict:
+    # The XML parser is only loaded once an export has to be read
+    from importer import parse_export
+
+    try:
+        connection = connect(cache_file)
+    except (OSError, sqlite3.Error):
+        entry["cached"] = False
+        return parse_export(path, progress)
+
+    try:
+        with connection:
+            result = lookup(connection, path, stat.st_size, stat.st_mtime_ns)
+            if result is None:
+                digest = file_hash(path)
+                result = lookup_content(connection, path, stat.st_size, stat.st_mtime_ns, digest)
+
+        if result is not None:
+            if progress is not None:
+                progress(trend_count(result))
+            return result
+
+        entry["cached"] = False
+        result = parse_export(path, progress)
+
+        with connection:
+            store(connection, path, stat.st_size, stat.st_mtime_ns, digest, result)
+        return result
+
+    except sqlite3.Error:
+        entry["cached"] = False
+        return parse_export(path, progress)
+    finally:
+        connection.close()
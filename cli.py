@@ -0,0 +1,317 @@
+"""
+    Command line entry point of Chart Replicator.
+
+    Builds chart exports without the GUI, it never imports PyQt5 or vcolorpicker
+    so it can run on build servers without a display.
+
+    Examples:
+        python cli.py build export.xml --name site-a
+        python cli.py build --context context.json --output ./output
+        python cli.py groups export.xml --prefix "Trend/Site A/"
+        python cli.py build export.xml --group "Trend/Site A/*"
+        python cli.py batch ./exports --workers 8
+        python cli.py watch ./exports --output ./charts
+        python cli.py serve --port 8750
+        python cli.py restyle charts.xml --pattern "AHU_*" --display-type Digital --color "#FFFF0000"
+"""
+import argparse
+import json
+import os
+import sys
+import xml.etree.ElementTree as ET
+
+import batch
+import engine
+import manifest
+import metrics
+import restyle
+import rules
+import server
+import shards
+import validation
+import watch
+from archive import OUTPUT_FORMATS
+from cache import parse_export_cached
+from styles import DISPLAY_TYPES, argb_to_hex, hex_to_argb
+from trends import TrendIndex, trend_references
+
+
+def load_context(args) -> tuple[dict, list[str]]:
+    """
+        Creates the chart context from the command line arguments.
+
+        The context comes from the export file, the JSON context file or both
+        (the JSON keys win), the explicit options are applied last.
+
+        Args:
+            args: The parsed command line arguments.
+
+        Returns:
+            A tuple with the chart context and the trend references of the
+            export (None without an export).
+    """
+    modbus = args.modbus
+    references = None
+    if args.export:
+        result = parse_export_cached(args.export)
+        modbus = modbus or result["Modbus"]
+        references = list(trend_references(result))
+        context = engine.context_from_result(result)
+        if args.group:
+            context["groups"] = engine.folder_groups(result, args.group)
+    elif args.group:
+        raise ValueError("--group needs an export to read the trend folders from")
+    else:
+        context = engine.new_context()
+
+    loaded = {}
+    if args.context:
+        with open(args.context, "r", encoding="utf-8") as file:
+            loaded = json.load(file)
+        context.update(loaded)
+
+    options = {
+        "serverVersion": args.server_version,
+        "serverPath": args.server_path,
+        "trendPathAnalog": args.analog_path,
+        "trendPathBinary": args.binary_path,
+    }
+    context.update({key: value for key, value in options.items() if value is not None})
+
+    # A baseNode given in the JSON context is kept unless Modbus is asked for
+    if modbus or "baseNode" not in loaded:
+        context["baseNode"] = engine.base_node(context["serverVersion"], modbus)
+
+    return context, references
+
+
+def cmd_build(args) -> int:
+    """
+        Builds one chart export, the same file the GUI Build button writes.
+
+        Returns:
+            The process exit code.
+    """
+    if not args.export and not args.context:
+        print("ERROR: an export file or --context is required", file=sys.stderr)
+        return 2
+
+    try:
+        context, references = load_context(args)
+        if args.profile:
+            rules.load_profile(args.profile).apply_context(context)
+    except (ET.ParseError, OSError, ValueError) as e:
+        print(f"ERROR: {str(e)}", file=sys.stderr)
+        return 1
+
+    # Charts pointing to trends the export does not have would only fail in EBO
+    if references is not None and not args.skip_validation:
+        missing = validation.missing_references(context, references)
+        if missing:
+            print(validation.report(missing), file=sys.stderr)
+            print(f"ERROR: {len(missing)} chart references not found in {args.export}, "
+                  f"use --skip-validation to build anyway", file=sys.stderr)
+            return 1
+
+    if args.shard_size:
+        ok, log = shards.build(context, args.name, args.output, args.shard_size, args.workers, args.template,
+                               args.compress)
+    else:
+        ok, log = manifest.build(context, args.name, args.output, args.delta, args.template, args.compress)
+    print(log, file=sys.stdout if ok else sys.stderr)
+    return 0 if ok else 1
+
+
+def cmd_groups(args) -> int:
+    """
+        Lists the trend folders of an export, the ones `build --group` can turn into chart groups.
+
+        Returns:
+            The process exit code.
+    """
+    try:
+        index = TrendIndex(parse_export_cached(args.export))
+    except (ET.ParseError, OSError) as e:
+        print(f"ERROR: {str(e)}", file=sys.stderr)
+        return 1
+
+    for folder in index.find(args.prefix, args.pattern):
+        print(f"{folder}\t{len(index.trends(folder))}\t{index.group_path(folder)}")
+    return 0
+
+
+def cmd_batch(args) -> int:
+    """
+        Builds the charts of every export in a folder, one output per export.
+
+        Returns:
+            The process exit code, 1 if any export failed.
+    """
+    summary = batch.build_directory(args.directory, args.output, args.workers, args.compress)
+    if not summary:
+        print(f"ERROR: no exports found in {args.directory}", file=sys.stderr)
+        return 1
+
+    for path, (ok, log) in summary.items():
+        print(f"{path}: {log}", file=sys.stdout if ok else sys.stderr)
+
+    failed = sum(1 for ok, _ in summary.values() if not ok)
+    print(f"{len(summary) - failed} built, {failed} failed")
+    return 1 if failed else 0
+
+
+def cmd_watch(args) -> int:
+    """
+        Rebuilds the charts of every export dropped into a folder, until interrupted.
+
+        Returns:
+            The process exit code.
+    """
+    try:
+        watcher = watch.Watcher(args.directory, args.output, args.debounce, log=lambda message: print(message, flush=True),
+                                output_format=args.compress)
+    except ValueError as e:
+        print(f"ERROR: {str(e)}", file=sys.stderr)
+        return 2
+
+    watcher.run(args.interval)
+    return 0
+
+
+def cmd_restyle(args) -> int:
+    """
+        Changes the display type and/or color of the charts of an existing chart export,
+        or lists their current styles.
+
+        Returns:
+            The process exit code.
+    """
+    if args.list:
+        try:
+            found = restyle.read_styles(args.export)
+        except (ET.ParseError, OSError, EOFError, ValueError) as e:
+            print(f"ERROR: {str(e)}", file=sys.stderr)
+            return 1
+        display_type_names = {value: name for name, value in DISPLAY_TYPES.items()}
+        for group, (names, styles) in found.items():
+            for row, name in enumerate(names):
+                print(f"{group}\t{name}\t{display_type_names.get(styles.display_types[row], styles.display_types[row])}\t"
+                      f"{argb_to_hex(styles.colors[row])}")
+        return 0
+
+    if args.display_type is None and args.color is None:
+        print("ERROR: --display-type, --color or --list is required", file=sys.stderr)
+        return 2
+
+    try:
+        color = hex_to_argb([args.color])[0] if args.color is not None else None
+    except ValueError:
+        print(f"ERROR: invalid color {args.color}, expected #AARRGGBB", file=sys.stderr)
+        return 2
+
+    output = args.output or os.path.join(engine.OUTPUT_DIR, restyle.restyled_name(args.export))
+    display_type = DISPLAY_TYPES[args.display_type] if args.display_type is not None else None
+    ok, log = restyle.restyle_file(args.export, output, args.pattern, args.group, display_type, color)
+    print(log, file=sys.stdout if ok else sys.stderr)
+    return 0 if ok else 1
+
+
+def cmd_serve(args) -> int:
+    """
+        Runs the local HTTP build service, until interrupted.
+
+        Returns:
+            The process exit code.
+    """
+    server.serve(args.host, args.port, args.template, args.max_renders, args.workers)
+    return 0
+
+
+def make_parser() -> argparse.ArgumentParser:
+    """
+        Creates the command line parser with one sub command per mode.
+    """
+    parser = argparse.ArgumentParser(prog="chart-replicator", description="Builds EBO chart exports from trends.")
+    parser.add_argument("--metrics", help="append the time and memory of every phase to this JSON lines file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = commands.add_parser("build", help="build one chart export")
+    build_parser.add_argument("export", nargs="?", help="EBO export to read the trends from (.xml, .xml.gz or .zip)")
+    build_parser.add_argument("--context", help="JSON file with the chart context")
+    build_parser.add_argument("--name", default="", help="output file name, the current date and time by default")
+    build_parser.add_argument("--output", default=engine.OUTPUT_DIR, help="output folder")
+    build_parser.add_argument("--compress", choices=sorted(OUTPUT_FORMATS), default="xml",
+                              help="write the charts as plain XML (default), .xml.gz or .zip")
+    build_parser.add_argument("--server-version", help="EBO version, e.g. 5.0.3.117")
+    build_parser.add_argument("--server-path", help="server path, e.g. /Server 1")
+    build_parser.add_argument("--analog-path", help="analog trends path")
+    build_parser.add_argument("--binary-path", help="binary trends path")
+    build_parser.add_argument("--modbus", action="store_true", help="the charts go inside a Modbus device")
+    build_parser.add_argument("--template", help="custom Jinja2 template, the built-in chart layout by default")
+    build_parser.add_argument("--profile", help="style profile name (see profiles/) or file styling the trends by name")
+    build_parser.add_argument("--group", action="append", metavar="PATTERN",
+                              help="also chart the trend folders of the export matching this pattern, "
+                                   "e.g. 'Trend/Site A/*' (repeatable, see the groups command)")
+    build_parser.add_argument("--skip-validation", action="store_true",
+                              help="build even if some chart references are not trends of the export")
+    output_mode = build_parser.add_mutually_exclusive_group()
+    output_mode.add_argument("--delta", action="store_true", help="write only the charts that changed since the last build")
+    output_mode.add_argument("--shard-size", type=int, help="split the charts into standalone files of this many charts")
+    build_parser.add_argument("--workers", type=int, help="processes writing the shards, one per core by default")
+    build_parser.set_defaults(func=cmd_build)
+
+    groups_parser = commands.add_parser("groups", help="list the trend folders of an export")
+    groups_parser.add_argument("export", help="EBO export to index")
+    groups_parser.add_argument("--prefix", default="", help="only the folders whose path starts with this")
+    groups_parser.add_argument("--pattern", help="only the folders whose path matches this shell-style pattern")
+    groups_parser.set_defaults(func=cmd_groups)
+
+    batch_parser = commands.add_parser("batch", help="build one chart export per export in a folder")
+    batch_parser.add_argument("directory", help="folder holding one EBO export per server")
+    batch_parser.add_argument("--output", default=engine.OUTPUT_DIR, help="output folder")
+    batch_parser.add_argument("--compress", choices=sorted(OUTPUT_FORMATS), default="xml",
+                              help="write the charts as plain XML (default), .xml.gz or .zip")
+    batch_parser.add_argument("--workers", type=int, help="number of processes, one per core by default")
+    batch_parser.set_defaults(func=cmd_batch)
+
+    watch_parser = commands.add_parser("watch", help="build the charts of every export dropped into a folder")
+    watch_parser.add_argument("directory", help="folder the EBO exports are dropped into")
+    watch_parser.add_argument("--output", default=engine.OUTPUT_DIR, help="output folder")
+    watch_parser.add_argument("--compress", choices=sorted(OUTPUT_FORMATS), default="xml",
+                              help="write the charts as plain XML (default), .xml.gz or .zip")
+    watch_parser.add_argument("--debounce", type=float, default=watch.DEBOUNCE_SECONDS,
+                              help="seconds a file must stay unchanged before it is built")
+    watch_parser.add_argument("--interval", type=float, default=watch.POLL_SECONDS, help="seconds between two polls")
+    watch_parser.set_defaults(func=cmd_watch)
+
+    restyle_parser = commands.add_parser("restyle", help="change the styles of the charts of an existing chart export")
+    restyle_parser.add_argument("export", help="chart export to restyle (.xml, .xml.gz or .zip)")
+    restyle_parser.add_argument("--output", help="file to write, output/{export name}-restyled.xml by default "
+                                                 "(.xml.gz or .zip for a compressed export)")
+    restyle_parser.add_argument("--pattern", help="only the charts whose name matches this pattern, e.g. 'AHU_*'")
+    restyle_parser.add_argument("--group", help="only the charts of this folder, e.g. 'Analog Group'")
+    restyle_parser.add_argument("--display-type", choices=list(DISPLAY_TYPES), help="new display type")
+    restyle_parser.add_argument("--color", help="new color, #AARRGGBB")
+    restyle_parser.add_argument("--list", action="store_true", help="print the current style of every chart and exit")
+    restyle_parser.set_defaults(func=cmd_restyle)
+
+    serve_parser = commands.add_parser("serve", help="serve chart builds over HTTP on this machine")
+    serve_parser.add_argument("--host", default=server.HOST, help="address to listen on, only this machine by default")
+    serve_parser.add_argument("--port", type=int, default=server.PORT, help="TCP port")
+    serve_parser.add_argument("--template", help="custom Jinja2 template, the built-in chart layout by default")
+    serve_parser.add_argument("--max-renders", type=int, help="exports rendered at once, one per core by default")
+    serve_parser.add_argument("--workers", type=int, help="processes parsing uploaded exports, one per core by default")
+    serve_parser.set_defaults(func=cmd_serve)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = make_parser().parse_args(argv)
+    if args.metrics:
+        metrics.enable(args.metrics)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
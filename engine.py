@@ -0,0 +1,378 @@
+import hashlib
+import os
+import time
+from datetime import datetime
+from functools import lru_cache
+
+import emitter
+import metrics
+from archive import export_stem, open_output, output_name
+from cache import CACHE_DIR, parse_export_cached
+from trends import GROUP_PATH_KEYS, Trend, TrendIndex, chart_count, in_fixed_group, own_paths
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+TEMPLATE_NAME = "template.jinja2"
+DEFAULT_TEMPLATE = os.path.join(TEMPLATE_DIR, TEMPLATE_NAME)
+OUTPUT_DIR = "./output"
+WRITE_BUFFER = 1 << 20
+PROGRESS_STEP = 500
+
+DEFAULT_DISPLAY_TYPE = 0
+DEFAULT_COLOR = "-11179217"
+
+
+def new_context() -> dict:
+    """
+        Creates an empty chart context, the same one `MyWidget` starts with.
+
+        Returns:
+            A dictionary with every key the template expects.
+    """
+    return {
+        "serverPath": "",
+        "serverVersion": "",
+        "trendPathBinary": "",
+        "trendPathAnalog": "",
+        "trendNameAnalog": [],
+        "trendNameBinary": [],
+        "groups": [],
+        "baseNode": "system.base.Folder"
+    }
+
+
+def default_trends(trend_names: list[str], paths: list = None) -> list[Trend]:
+    """
+        Builds the chart entries of a list of trends with the default style.
+
+        Args:
+            trend_names: A list of trend names.
+            paths: The own path of each trend (see `trends.own_paths`), None
+                for trends that all live in the path of their group.
+
+        Returns:
+            A list of `trends.Trend` records.
+    """
+    if paths is None:
+        paths = [None] * len(trend_names)
+    return [
+        Trend(name.strip(), DEFAULT_DISPLAY_TYPE, DEFAULT_COLOR, path)
+        for name, path in zip(trend_names, paths) if name.strip()
+    ]
+
+
+def base_node(server_version: str, modbus: bool) -> str:
+    """
+        Chooses the folder type the charts are placed in.
+
+        Modbus devices only need their own folder type before EBO version 6.
+
+        Args:
+            server_version: The EBO version, e.g. "5.0.3.117".
+            modbus: True if the charts go inside a Modbus device.
+
+        Returns:
+            The TYPE of the chart folders.
+    """
+    if modbus and int(server_version.split(".")[0]) < 6:
+        return "modbus.folder.DeviceFolder"
+    return "system.base.Folder"
+
+
+def folder_groups(result: dict, patterns: list[str]) -> list[dict]:
+    """
+        Turns the trend folders of an export matching some patterns into extra chart groups.
+
+        Each folder becomes a chart folder named after it (after its whole path
+        when two folders share a name), with one chart per trend in the
+        default style. The Analog and Binary groups of the 'Trend' folder and
+        their subfolders already have their own section and are left out.
+
+        Args:
+            result: The dictionary returned by `importer.parse_export`.
+            patterns: Shell-style patterns of the folder paths, e.g. "Trend/Site A/*".
+
+        Returns:
+            The extra groups, dictionaries with name, path and trends, for `context["groups"]`.
+    """
+    index = TrendIndex(result)
+    chosen = []
+    for pattern in patterns:
+        for folder in index.find(pattern=pattern):
+            if folder in chosen or in_fixed_group(folder):
+                continue
+            chosen.append(folder)
+
+    groups = []
+    names = set()
+    for folder in chosen:
+        name = folder.rpartition("/")[2]
+        if name in names or name in GROUP_PATH_KEYS:
+            name = folder.replace("/", " - ")
+        names.add(name)
+        path = index.group_path(folder)
+        paths = [None if trend_path is None or trend_path == path else trend_path for trend_path in index.paths(folder)]
+        groups.append({"name": name, "path": path, "trends": default_trends(index.trends(folder), paths)})
+    return groups
+
+
+def context_from_result(result: dict) -> dict:
+    """
+        Creates a chart context from the information read by `importer.parse_export`.
+
+        Every trend gets the default display type and color, like a Build
+        without opening the display type popups.
+
+        Args:
+            result: The dictionary returned by `importer.parse_export`.
+
+        Returns:
+            A chart context ready to be rendered.
+    """
+    trends = result.get("Trends") or {}
+    context = new_context()
+    context["serverVersion"] = (result.get("RuntimeVersion") or "").strip()
+    context["serverPath"] = (result.get("ServerFullPath") or "").strip()
+    context["trendPathAnalog"] = (result.get("Path Analog") or "").strip()
+    context["trendPathBinary"] = (result.get("Path Binary") or "").strip()
+    context["trendNameAnalog"] = default_trends(trends.get("Analog Group", []), own_paths(result, "Analog Group"))
+    context["trendNameBinary"] = default_trends(trends.get("Binary Group", []), own_paths(result, "Binary Group"))
+    context["baseNode"] = base_node(context["serverVersion"], result.get("Modbus", False))
+    return context
+
+
+@lru_cache(maxsize=None)
+def get_template(path: str = DEFAULT_TEMPLATE) -> "jinja2.Template":
+    """
+        Loads a template once per process.
+
+        Jinja2 is only imported here, the native emitter and the GUI start
+        without it.
+
+        The environment keeps its compiled bytecode in `CACHE_DIR`, so a new
+        process does not compile the template again either.
+
+        Args:
+            path: The template file, the built-in template by default.
+
+        Returns:
+            The compiled template.
+    """
+    import jinja2
+
+    bytecode_cache = None
+    try:
+        os.makedirs(os.path.join(CACHE_DIR, "jinja2"), exist_ok=True)
+        bytecode_cache = jinja2.FileSystemBytecodeCache(os.path.join(CACHE_DIR, "jinja2"))
+    except OSError:
+        # Read only installs still work, they just compile on every start
+        pass
+
+    directory, name = os.path.split(os.path.abspath(path))
+    env = jinja2.Environment(loader=jinja2.FileSystemLoader(directory), bytecode_cache=bytecode_cache)
+    return env.get_template(name)
+
+
+@lru_cache(maxsize=None)
+def template_digest(path: str = DEFAULT_TEMPLATE) -> str:
+    """
+        Hashes the template source, so outputs of an older template can be told apart.
+
+        Args:
+            path: The template file, the built-in template by default.
+
+        Returns:
+            The hex digest of the template file.
+    """
+    with open(path, "rb") as file:
+        return hashlib.sha1(file.read()).hexdigest()
+
+
+def default_name() -> str:
+    """
+        Returns the default output file name, the current date and time.
+    """
+    return datetime.now().strftime("%d-%m-%Y-%H-%M-%S")
+
+
+def render(context: dict) -> str:
+    """
+        Renders the chart template with the given context.
+
+        Args:
+            context: The chart context.
+
+        Returns:
+            The chart export as a string.
+    """
+    return get_template().render(context)
+
+
+def stream(context: dict, template: str = DEFAULT_TEMPLATE):
+    """
+        Renders a Jinja2 chart template piece by piece.
+
+        Args:
+            context: The chart context.
+            template: The template file, the built-in template by default.
+
+        Returns:
+            An iterator over the rendered chunks of the chart export.
+    """
+    return get_template(template).generate(context)
+
+
+def encoded_stream(context: dict, template: str = None):
+    """
+        Renders the chart export as encoded blocks ready to be written.
+
+        Without a template the native emitter (see `emitter.py`) is used, it gives
+        the same bytes as the built-in template, only faster and with the values
+        escaped. A custom template is rendered with Jinja2.
+
+        Args:
+            context: The chart context.
+            template: A custom Jinja2 template file, None for the native emitter.
+
+        Returns:
+            An iterator over the encoded chunks of the chart export.
+    """
+    if template is None:
+        return emitter.stream(context)
+
+    newline = os.linesep.encode("utf-8")
+    if newline == b"\n":
+        return (chunk.encode("utf-8") for chunk in stream(context, template))
+    return (chunk.encode("utf-8").replace(b"\n", newline) for chunk in stream(context, template))
+
+
+def count_trends(context: dict, progress) -> tuple[dict, list[int]]:
+    """
+        Wraps the trend lists of a context so rendering reports its progress.
+
+        Args:
+            context: The chart context.
+            progress: Callable receiving the number of trends rendered so far,
+                every `PROGRESS_STEP` trends and once at the end.
+
+        Returns:
+            A tuple with a shallow copy of the context whose trend lists count what
+            is rendered, and a one item list holding that count.
+    """
+    counter = [0]
+
+    def counted(items):
+        for item in items:
+            yield item
+            counter[0] += 1
+            if counter[0] % PROGRESS_STEP == 0:
+                progress(counter[0])
+
+    counted_context = dict(context)
+    counted_context["trendNameAnalog"] = counted(context["trendNameAnalog"])
+    counted_context["trendNameBinary"] = counted(context["trendNameBinary"])
+    counted_context["groups"] = [dict(group, trends=counted(group["trends"])) for group in context.get("groups") or ()]
+    return counted_context, counter
+
+
+def write(context: dict, path: str, progress=None, template: str = None) -> None:
+    """
+        Streams the rendered chart export into a file.
+
+        The chunks go straight into a buffered file, the whole export is never
+        held in memory. If anything goes wrong the partial file is removed.
+
+        Args:
+            context: The chart context.
+            path: The file to write, compressed on the fly if it ends with
+                `.xml.gz` or `.zip` (see `archive.open_output`).
+            progress: Optional callable, receives the number of trends rendered so far.
+            template: A custom Jinja2 template file, None for the native emitter.
+    """
+    trends = chart_count(context)
+    if progress is not None:
+        context, rendered = count_trends(context, progress)
+
+    with metrics.span("write", file=path, trends=trends) as entry:
+        try:
+            # Rendering and disk writes are interleaved, time them apart
+            render_seconds = write_seconds = 0.0
+            chunks = encoded_stream(context, template)
+            with open_output(path, WRITE_BUFFER) as file:
+                while True:
+                    started = time.perf_counter()
+                    chunk = next(chunks, None)
+                    rendered_at = time.perf_counter()
+                    if chunk is None:
+                        break
+                    file.write(chunk)
+                    render_seconds += rendered_at - started
+                    write_seconds += time.perf_counter() - rendered_at
+            if progress is not None:
+                progress(rendered[0])
+        except BaseException:
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+        entry["render_seconds"] = render_seconds
+        entry["write_seconds"] = write_seconds
+        entry["bytes"] = os.path.getsize(path)
+
+
+def build(context: dict, name: str = "", output_dir: str = OUTPUT_DIR, template: str = None,
+          output_format: str = "xml") -> tuple[bool, str]:
+    """
+        Renders the context and saves it as `{output_dir}/{name}.xml`.
+
+        Args:
+            context: The chart context, `baseNode` must already be set.
+            name: The file name without extension, the current date and time if empty.
+            output_dir: The folder the file is written to, created if missing.
+            template: A custom Jinja2 template file, None for the native emitter.
+            output_format: "xml", or "gz"/"zip" to write `{name}.xml.gz`/`{name}.zip`.
+
+        Returns:
+            A tuple containing a boolean indicating success and a message string.
+    """
+    try:
+        if not name:
+            name = default_name()
+
+        file_name = output_name(name, output_format)
+        os.makedirs(output_dir, exist_ok=True)
+        write(context, os.path.join(output_dir, file_name), template=template)
+
+        return True, f"Saved as: {file_name}"
+
+    except Exception as e:
+        return False, f"ERROR: {str(e)}"
+
+
+def build_export(export_path: str, name: str = "", output_dir: str = OUTPUT_DIR,
+                 output_format: str = "xml") -> tuple[bool, str]:
+    """
+        Reads an EBO export (through the parsed export cache) and builds its charts
+        with the default style.
+
+        This is what the GUI does with "Use this file" followed by Build.
+
+        Args:
+            export_path: The EBO export to read the trends from, compressed or not.
+            name: The output file name, the export's name if empty.
+            output_dir: The folder the file is written to.
+            output_format: "xml", "gz" or "zip", see `build`.
+
+        Returns:
+            A tuple containing a boolean indicating success and a message string.
+    """
+    try:
+        result = parse_export_cached(export_path)
+        if result["Trends"] is None:
+            return False, "ERROR: no 'Trend' folder found in the export"
+        context = context_from_result(result)
+    except Exception as e:
+        return False, f"ERROR: {str(e)}"
+
+    if not name:
+        name = export_stem(export_path)
+
+    return build(context, name, output_dir, output_format=output_format)
@@ -0,0 +1,185 @@
+import re
+import xml.etree.ElementTree as ET
+
+from archive import open_export
+from trends import PathTable
+
+GROUP_PATTERN = re.compile(r"^(Binary Group|Analog Group)$")
+MODBUS_FOLDER = "modbus.folder.DeviceFolder"
+TREND_LOG_TYPE = "trend.log."
+PROGRESS_STEP = 500
+
+
+def parse_reference_path(reference: str) -> str:
+    """
+        Converts a trend log reference into the folder path used by the charts.
+
+        Args:
+            reference: The `Object` attribute of a trend `Reference`.
+
+        Returns:
+            The reference with "Data" swapped for "Trend" and the trend name removed.
+    """
+    return reference.replace("Data", "Trend").rsplit('/', 1)[0]
+
+
+def parse_export(source, progress=None) -> dict:
+    """
+        Extracts the chart information from an EBO export in a single streaming pass.
+
+        The file is read with `iterparse`, every element is dropped as soon as its
+        end tag is reached, so memory stays bounded no matter how big the export is.
+        The information gathered is the same as the one kept in `MyWidget.result`:
+
+        - RuntimeVersion
+        - ServerFullPath (from MetaInformation)
+        - Trend group names and their reference paths (from 'Trend' OI)
+        - Modbus, True when one of the groups is a Modbus device folder
+        - Paths, the path of every trend (from its own reference), as indexes
+          into PathTable, the list of distinct paths; -1 when the trend has no
+          reference (see `trends.trend_paths`)
+        - Folders, every folder of the export holding trend logs (OI of a
+          `trend.log.*` type), at any depth and under any name, keyed by its
+          path from ExportedObjects ("Trend/Site A/Chillers"): the names of
+          its trends and their paths, as indexes into PathTable (see
+          `trends.TrendIndex`)
+
+        Args:
+            source: A file path or a binary file object holding the export, an
+                `.xml.gz` or `.zip` path is decompressed on the fly (see `archive.open_export`).
+            progress: Optional callable, receives the number of trends read so far
+                every `PROGRESS_STEP` trends and once at the end.
+
+        Returns:
+            A dictionary with the parsed information.
+
+        Raises:
+            ET.ParseError: If the export is not well formed XML.
+            FileNotFoundError: If the file does not exist.
+            ValueError: If a zip archive holds no XML export.
+    """
+    if isinstance(source, str):
+        with open_export(source) as file:
+            return parse_export(file, progress)
+
+    result = {
+        "RuntimeVersion": None,
+        "ServerFullPath": None,
+        "Path Analog": None,
+        "Path Binary": None,
+        "Trends": None,
+        "Modbus": False,
+        "PathTable": [],
+        "Paths": None,
+        "Folders": {}
+    }
+
+    # Each entry of the stack is the element and the section it belongs to
+    stack = []
+    trend_depth = None   # depth of the 'Trend' OI, None until it is found
+    trend_done = False   # only the first 'Trend' OI is used
+    groups = []          # (name, type, depth) of the groups being read, outermost first
+    trend_groups = None
+    trend_count = 0
+    path_table = PathTable()
+    trend_paths = None
+    current = None       # (depth, [(group, position)]) of the trend being read, until its reference is found
+    folders = result["Folders"]
+    names = []           # NAME of the open OI, the path of the folder being read
+    log = None           # (depth, folder paths, position) of the trend log being read, until its reference is found
+
+    for event, elem in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            depth = len(stack)
+            parent_section = stack[-1][1] if stack else None
+
+            if depth == 1 and elem.tag in ("MetaInformation", "ExportedObjects"):
+                section = elem.tag
+            else:
+                section = parent_section
+
+            if section == "MetaInformation":
+                if elem.tag == "RuntimeVersion" and result["RuntimeVersion"] is None:
+                    result["RuntimeVersion"] = elem.attrib.get('Value')
+                elif elem.tag == "ServerFullPath" and result["ServerFullPath"] is None:
+                    result["ServerFullPath"] = elem.attrib.get('Value')
+
+            elif section == "ExportedObjects" and elem.tag == "OI":
+                name = elem.attrib.get('NAME')
+                if (elem.attrib.get('TYPE') or "").startswith(TREND_LOG_TYPE) and names:
+                    folder = folders.setdefault("/".join(names), [[], []])
+                    folder[0].append(name)
+                    folder[1].append(-1)
+                    log = (depth, folder[1], len(folder[1]) - 1)
+                names.append(name or "")
+
+                if trend_depth is None and not trend_done and name == 'Trend':
+                    trend_depth = depth
+                    trend_groups = {"Binary Group": [], "Analog Group": []}
+                    trend_paths = {"Binary Group": [], "Analog Group": []}
+                elif trend_depth is not None:
+                    # Every OI inside a group is a trend of that group
+                    positions = []
+                    for group_name, type_folder, _ in groups:
+                        positions.append((group_name, len(trend_paths[group_name])))
+                        trend_groups[group_name].append(name)
+                        trend_paths[group_name].append(-1)
+                        if type_folder == MODBUS_FOLDER:
+                            result["Modbus"] = True
+                    if groups:
+                        trend_count += 1
+                        current = (depth, positions)
+                        if progress is not None and trend_count % PROGRESS_STEP == 0:
+                            progress(trend_count)
+                    if GROUP_PATTERN.match(name or ""):
+                        groups.append((name, elem.attrib.get('TYPE'), depth))
+
+            elif section == "ExportedObjects" and elem.tag == "Reference" and (groups or log is not None):
+                reference = elem.attrib.get('Object')
+                if groups:
+                    # The first reference of a group gives the path of all its trends
+                    key = "Path Analog" if groups[0][0] == "Analog Group" else "Path Binary"
+                    if result[key] is None and reference:
+                        result[key] = parse_reference_path(reference)
+                if reference and (current is not None or log is not None):
+                    # The first reference of a trend gives its own path
+                    path_id = path_table.add(parse_reference_path(reference))
+                    if current is not None:
+                        for group_name, position in current[1]:
+                            trend_paths[group_name][position] = path_id
+                        current = None
+                    if log is not None:
+                        log[1][log[2]] = path_id
+                        log = None
+
+            stack.append((elem, section))
+
+        else:
+            _, section = stack.pop()
+            depth = len(stack)
+
+            if elem.tag == "OI" and section == "ExportedObjects":
+                names.pop()
+                if log is not None and log[0] == depth:
+                    log = None
+
+            if elem.tag == "OI" and trend_depth is not None:
+                if current is not None and current[0] == depth:
+                    current = None
+                if groups and groups[-1][2] == depth:
+                    groups.pop()
+                elif depth == trend_depth:
+                    trend_depth = None
+                    trend_done = True
+
+            # Nothing is read from a closed element, drop it and its siblings
+            elem.clear()
+            if stack:
+                del stack[-1][0][:]
+
+    result["Trends"] = trend_groups
+    result["Paths"] = trend_paths
+    result["PathTable"] = path_table.paths
+    if progress is not None:
+        progress(trend_count)
+    return result
@@ -1,93 +1,192 @@
+import os
 import sys
-import jinja2
 from datetime import datetime
 from PyQt5.QtWidgets import (QApplication, QWidget, QLabel, QLineEdit, QComboBox, 
-                             QTextEdit, QVBoxLayout, QPushButton, QMessageBox, 
-                             QHBoxLayout, QRadioButton, QDialog, QButtonGroup, QScrollArea,  QFileDialog, QCheckBox)
+                             QPlainTextEdit, QVBoxLayout, QPushButton, QMessageBox, 
+                             QHBoxLayout, QDialog, QFileDialog, QCheckBox,
+                             QTableView, QHeaderView, QAbstractItemView, QStyledItemDelegate, QProgressBar)
 from PyQt5.QtGui import QIcon
-from PyQt5.QtCore import Qt
-from vcolorpicker import getColor, useLightTheme
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QThreadPool
 from PyQt5.QtGui import QColor
-import xml.etree.ElementTree as ET
-import re
+from cache import parse_export_cached
+import engine
+import manifest
+import merge
+import metrics
+from styles import TrendStyles, DISPLAY_TYPES
+from workers import Task
+from trendlist import TrendList
+from trends import Trend, chart_count, own_paths, trend_references
+import validation
+import rules
+
+class TrendStyleModel(QAbstractTableModel):
+    """
+        Table model holding the name, display type and color of each trend.
+
+        The styles live in a `styles.TrendStyles` (typed arrays), the view asks
+        for the rows it is drawing, so the number of trends does not change how
+        many widgets exist.
+    """
+    NAME, DISPLAY_TYPE, COLOR = range(3)
+    HEADERS = ("Trend", "Display Type", "Color")
+
+    def __init__(self, trend_names: list[str], display_type_options: dict, parent=None, styles: TrendStyles = None):
+        """
+            Initializes the model with every trend set to the default style, or to the given styles.
+
+            Args:
+                trend_names: A list of trend names.
+                display_type_options: A dictionary mapping display type names to their values.
+                parent: The parent object, if any.
+                styles: The current styles of the trends, e.g. read back by `restyle.read_styles`.
+        """
+        super().__init__(parent)
+        self.trend_names = trend_names
+        self.display_type_options = display_type_options
+        self.display_type_names = {value: name for name, value in display_type_options.items()}
+        default_type = 0 if 0 in self.display_type_names else next(iter(self.display_type_names))
+        self.styles = styles if styles is not None else TrendStyles(len(trend_names), default_type)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.trend_names)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return str(section)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row, column = index.row(), index.column()
+
+        if column == self.NAME and role == Qt.DisplayRole:
+            return self.trend_names[row]
+        if column == self.DISPLAY_TYPE and role in (Qt.DisplayRole, Qt.EditRole):
+            return self.display_type_names[self.styles.display_types[row]]
+        if column == self.COLOR:
+            if role == Qt.BackgroundRole:
+                return QColor.fromRgba(self.styles.colors[row] & 0xFFFFFFFF)
+            if role == Qt.ToolTipRole:
+                return "Double click to change the chart's line color"
+        return None
+
+    def flags(self, index):
+        flags = super().flags(index)
+        if index.column() == self.DISPLAY_TYPE:
+            flags |= Qt.ItemIsEditable
+        return flags
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or role != Qt.EditRole:
+            return False
+        if index.column() == self.DISPLAY_TYPE and value in self.display_type_options:
+            self.styles.set_display_type(index.row(), self.display_type_options[value])
+        elif index.column() == self.COLOR:
+            self.styles.set_color(index.row(), value)
+        else:
+            return False
+        self.dataChanged.emit(index, index, [role])
+        return True
+
+    def set_color(self, row: int, color: str):
+        """
+            Sets the color of one trend.
+
+            Args:
+                row: The index of the trend.
+                color: The color as a "#AARRGGBB" hex string.
+        """
+        self.setData(self.index(row, self.COLOR), color)
+
+    def replicate(self, source_row: int, ranges: list[tuple[int, int]] = None):
+        """
+            Copies the display type and color of one trend to other trends.
 
-useLightTheme(True)
+            Args:
+                source_row: The index of the trend to copy from.
+                ranges: A list of `(first, last)` row ranges to change, every trend if None.
+        """
+        if not self.trend_names:
+            return
+        if ranges is None:
+            ranges = [(0, len(self.trend_names) - 1)]
+
+        for first, last in ranges:
+            self.styles.apply_range(source_row, first, last + 1)
+            self.dataChanged.emit(self.index(first, self.DISPLAY_TYPE), self.index(last, self.COLOR))
+
+class DisplayTypeDelegate(QStyledItemDelegate):
+    """
+        Combo box editor used by the display type column.
+    """
+    def __init__(self, display_type_options: dict, parent=None):
+        super().__init__(parent)
+        self.display_type_options = display_type_options
+
+    def createEditor(self, parent, option, index):
+        editor = QComboBox(parent)
+        editor.addItems(list(self.display_type_options))
+        # Commit as soon as an option is picked, no need to leave the cell
+        editor.activated.connect(lambda _: self.commitData.emit(editor))
+        return editor
+
+    def setEditorData(self, editor, index):
+        editor.setCurrentText(index.data(Qt.EditRole))
+
+    def setModelData(self, editor, model, index):
+        model.setData(index, editor.currentText(), Qt.EditRole)
 
 class DisplayTypePopup(QDialog):
     """
         This object diplays the popup that allows the selection of 
         colors and display modes of each chart that belongs to a trend  
     """
-    def __init__(self, trend_names: list[str], display_type_options: list[int], parent=None):
+    def __init__(self, trend_names: list[str], display_type_options: dict, parent=None, styles: TrendStyles = None):
         """
             Initializes the dialog with the given trend names and display type options.
 
+            The trends are shown in a table view backed by `TrendStyleModel`, only
+            the visible rows are drawn so the dialog opens quickly for any number of trends.
+
             Args:
                 trend_names: A list of trend names.
-                display_type_options: A list of display type options.
+                display_type_options: A dictionary mapping display type names to their values.
                 parent: The parent widget, if any.
+                styles: The styles to start from, every trend gets the default style if None.
 
         """
         super().__init__(parent)
 
-        self.color_buttons = []
         self.setWindowTitle("Select Display Type for Each Trend")
         self.setModal(True)
         self.trend_names = trend_names
         self.display_type_options = display_type_options
-        self.selected_display_types = {}
-        self.selected_colors = {}
-
-        scroll_area = QScrollArea()
-        scroll_area.setWidgetResizable(True)  # Allow resizing
-        scroll_area.setFixedHeight(500)  # Adjust to your desired height
-        scroll_area.setFixedWidth(500)  # Adjust to your desired height        
-
-        # Create a widget to hold the layout
-        content_widget = QWidget()
-        layout = QVBoxLayout(content_widget)
-
-        # Create radio button groups and color pickers for each trend name
-        for i, trend_name in enumerate(trend_names):
-            # Add trend name as a label
-            label = QLabel(f"{trend_name}")
-            layout.addWidget(label)
-
-            # Horizontal layout to align radio buttons and color picker button
-            trend_layout = QHBoxLayout()
-
-            # Radio button group for display types
-            button_group = QButtonGroup(self)
-            button_layout = QHBoxLayout()
-
-            # Create radio buttons for display types
-            for display_type, display_value in display_type_options.items():
-                radio_button = QRadioButton(display_type)
-                button_group.addButton(radio_button)
-                button_layout.addWidget(radio_button)
-                # Default selection for each line
-                if display_value == 0:
-                    radio_button.setChecked(True) 
-
-            # Add radio buttons layout to trend layout
-            trend_layout.addLayout(button_layout)
-
-            # Add a color picker button
-            color_button = QPushButton()
-            color_button.setToolTip("Change the chart's line color")
-            color_button.setIcon(QIcon("./static/brush.ico"))
-            color_button.clicked.connect(lambda _, idx=i, btn=color_button: self.pick_color(idx, btn))
-            trend_layout.addWidget(color_button)
-            self.color_buttons.append(color_button)
-            # Store default color
-            self.selected_colors[i] = "#FF556B2F"
-
-            # Add trend layout to main layout
-            layout.addLayout(trend_layout)
-            self.selected_display_types[i] = button_group
-
-        # Set the content widget in the scroll area
-        scroll_area.setWidget(content_widget)
+        self.model = TrendStyleModel(trend_names, display_type_options, self, styles)
+
+        self.view = QTableView()
+        self.view.setModel(self.model)
+        self.view.setItemDelegateForColumn(TrendStyleModel.DISPLAY_TYPE, DisplayTypeDelegate(display_type_options, self.view))
+        self.view.setEditTriggers(QAbstractItemView.CurrentChanged | QAbstractItemView.DoubleClicked | QAbstractItemView.SelectedClicked)
+        self.view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.view.setFixedHeight(500)  # Adjust to your desired height
+        self.view.setFixedWidth(500)  # Adjust to your desired height
+        self.view.doubleClicked.connect(self.cell_double_clicked)
+
+        # Fixed row heights and header sizes, nothing is measured per row
+        self.view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.view.verticalHeader().setDefaultSectionSize(24)
+        self.view.horizontalHeader().setSectionResizeMode(TrendStyleModel.NAME, QHeaderView.Stretch)
+        self.view.horizontalHeader().setSectionResizeMode(TrendStyleModel.DISPLAY_TYPE, QHeaderView.Fixed)
+        self.view.horizontalHeader().setSectionResizeMode(TrendStyleModel.COLOR, QHeaderView.Fixed)
+        self.view.setColumnWidth(TrendStyleModel.DISPLAY_TYPE, 120)
+        self.view.setColumnWidth(TrendStyleModel.COLOR, 50)
 
         # Main layout for the dialog
         main_layout = QVBoxLayout(self)
@@ -95,13 +194,16 @@ class DisplayTypePopup(QDialog):
         replicate_ = QHBoxLayout()
         replicate_button = QPushButton("Replicate")
         replicate_button.clicked.connect(self.replicate_button_clicked)
+        replicate_selection_button = QPushButton("Replicate to selection")
+        replicate_selection_button.clicked.connect(self.replicate_selection_button_clicked)
         self.combo_box_lines = QComboBox()
         self.combo_box_lines.addItems([str(i) for i, _ in enumerate(trend_names)])
         replicate_.addWidget(self.combo_box_lines)
         replicate_.addWidget(replicate_button)
+        replicate_.addWidget(replicate_selection_button)
 
-        # Add the scroll area to the main layout
-        main_layout.addWidget(scroll_area)
+        # Add the table to the main layout
+        main_layout.addWidget(self.view)
         main_layout.addLayout(replicate_)
 
         # Create a layout for the OK button
@@ -120,45 +222,50 @@ class DisplayTypePopup(QDialog):
         """
             Replicates the display type and color of a selected trend to other trends.
 
-            This method gets the selected trend from the combo box, retrieves its display type and color, and then applies them to the other selected trends.
+            This method gets the selected trend from the combo box, retrieves its display type and color, and then applies them to the other trends.
         """
         selected_line_index = self.combo_box_lines.currentIndex()
+        if selected_line_index >= 0:
+            self.model.replicate(selected_line_index)
 
-        # Get the selected display type and color for the source line
-        source_button_group = self.selected_display_types[selected_line_index]
-        source_button = source_button_group.checkedButton()
-        source_display_type = source_button.text()
-        source_color = self.selected_colors[selected_line_index]
-
-        # Iterate through other lines and replicate
-        for i, button_group in self.selected_display_types.items():
-            if i != selected_line_index:
-                # Set the display type
-                for button in button_group.buttons():
-                    if button.text() == source_display_type:
-                        button.setChecked(True)
-                        break
-                
-                # Set the color
-                self.selected_colors[i] = source_color
-                # Access the color button directly using the stored reference
-                color_button = self.color_buttons[i]
-                color_button.setStyleSheet(f"background-color: {source_color};")
+    def replicate_selection_button_clicked(self):
+        """
+            Replicates the display type and color of the trend chosen in the combo box
+            to the rows selected in the table.
+
+            The selection is read as contiguous ranges, each one is a single array operation.
+        """
+        selected_line_index = self.combo_box_lines.currentIndex()
+        if selected_line_index >= 0:
+            ranges = [(r.top(), r.bottom()) for r in self.view.selectionModel().selection()]
+            self.model.replicate(selected_line_index, ranges)
+
+    def cell_double_clicked(self, index):
+        """
+            Opens the color picker when a cell of the color column is double clicked.
+
+            Args:
+                index: The model index that was double clicked.
+        """
+        if index.column() == TrendStyleModel.COLOR:
+            self.pick_color(index.row())
 
-    def pick_color(self, index: int, button: Qt):
+    def pick_color(self, index: int):
         """
             Opens a color picker to select a color for a specific trend.
 
             Args:
                 index: The index of the trend in the list.
-                button: The color button associated with the trend.
         """
+        # vcolorpicker brings its own widgets and qtpy, loaded the first time a color is picked
+        from vcolorpicker import getColor, useLightTheme
+        useLightTheme(True)
+
         color = getColor((85,107,47))  # Open the color picker
         if color:
             if isinstance(color, tuple):  # If the color is a tuple, convert to hex
                 color = QColor(int(color[0]),int(color[1]),int(color[2])).name(QColor.HexArgb)
-            self.selected_colors[index] = color  # Save the selected color
-            button.setStyleSheet(f"background-color: {color};")  # Update button background
+            self.model.set_color(index, color)  # Save the selected color
 
     def get_selected_display_types(self):
         """
@@ -169,23 +276,8 @@ class DisplayTypePopup(QDialog):
                     - A list of selected display types.
                     - A list of selected colors in ARGB format.
         """
-        display_types = []
-        colors_in_argb = []
-
-        for i, button_group in self.selected_display_types.items():
-            # Get selected display type
-            selected_button = button_group.checkedButton()
-            display_type_text = selected_button.text()
-            display_types.append(self.display_type_options[display_type_text])
-
-            # Convert color to ARGB
-            color_qcolor = self.selected_colors[i]
-            unsigned_int = int(color_qcolor[1:], 16)
-            if unsigned_int > 0x7FFFFFFF:
-                unsigned_int = unsigned_int - 0x100000000
-
-            colors_in_argb.append(unsigned_int)
-
+        # Colors are already kept as signed ARGB integers
+        display_types, colors_in_argb = self.model.styles.to_lists()
         return display_types, colors_in_argb
 
 class MyWidget(QWidget):
@@ -207,19 +299,12 @@ class MyWidget(QWidget):
             - `show_display_type_popup_analog` and `show_display_type_popup_binary` to
             open display type configuration dialogs.
             - `print_values` to generate the final XML file.
+            - Creates the progress bar and Cancel button used while a background task runs.
             - Sets up the main layout for the widget.
         """
         super().__init__()
 
-        self.context = {
-            "serverPath":"",
-            "serverVersion": "",
-            "trendPathBinary":"",
-            "trendPathAnalog":"",
-            "trendNameAnalog": [],
-            "trendNameBinary": [],
-            "baseNode":"system.base.Folder"
-        }
+        self.context = engine.new_context()
         
         self.result = {
             "RuntimeVersion": None,
@@ -230,6 +315,7 @@ class MyWidget(QWidget):
         }
 
         self.name = ""
+        self.selected_files = []
 
         self.setWindowTitle("Chart Builder")
         self.setWindowIcon(QIcon("./static/favicon.ico"))
@@ -263,9 +349,22 @@ class MyWidget(QWidget):
         self.modbus_check = QCheckBox("Is it Modbus ?")
         self.modbus_check.setChecked(False)
 
+        self.delta_check = QCheckBox("Only new or changed charts")
+        self.delta_check.setToolTip("Writes only the charts that changed since the last build of this server (see output/manifest.json)")
+        self.delta_check.setChecked(False)
+
+        # The chart export can be compressed on the fly for copying between sites
+        self.output_box = QHBoxLayout()
+        self.output_label = QLabel("Output:")
+        self.output_combo = QComboBox()
+        for output_format, label in (("xml", "XML"), ("gz", "Compressed (.xml.gz)"), ("zip", "Compressed (.zip)")):
+            self.output_combo.addItem(label, output_format)
+        self.output_box.addWidget(self.output_label)
+        self.output_box.addWidget(self.output_combo)
+
         self.display_type_label = QLabel("Display Type:")
         self.display_type_combo = QComboBox()
-        self.display_type_combo.addItems(["Line", "Discrete Line", "Digital", "Bars"])
+        self.display_type_combo.addItems(list(DISPLAY_TYPES))
 
         self.select_display_type_button_analog = QPushButton("Config Display Type for Analog")
         self.select_display_type_button_binary = QPushButton("Config Display Type for Binary")
@@ -274,17 +373,24 @@ class MyWidget(QWidget):
         self.trend_path_analog = QLineEdit("../../../../Trend/Analog Group")
                 
         self.trend_names_label_analog = QLabel("Analog Trends Names:")
-        self.trend_names_edit_analog = QTextEdit()
+        self.trend_names_edit_analog = QPlainTextEdit()
+        self.trends_analog = TrendList()
+        self.trend_names_edit_analog.textChanged.connect(self.trends_analog_edited)
 
         self.trend_path_label_binary = QLabel("Binary Trends Path:")
         self.trend_path_binary = QLineEdit("../../../../Trend/Binary Group")
         
         self.trend_names_label_binary = QLabel("Binary Trends Names:")
-        self.trend_names_edit_binary = QTextEdit()
+        self.trend_names_edit_binary = QPlainTextEdit()
+        self.trends_binary = TrendList()
+        self.trend_names_edit_binary.textChanged.connect(self.trends_binary_edited)
 
         self.submit_button = QPushButton("Build")
         self.submit_button.clicked.connect(self.print_values)
 
+        self.restyle_button = QPushButton("Restyle Existing Charts")
+        self.restyle_button.clicked.connect(self.restyle_charts)
+
         # Connect buttons to show popup
         self.select_display_type_button_analog.clicked.connect(lambda _ : self.show_display_type_popup_analog())
         self.select_display_type_button_binary.clicked.connect(lambda _ : self.show_display_type_popup_binary())
@@ -337,9 +443,43 @@ class MyWidget(QWidget):
         self.footnote_label.setAlignment(Qt.AlignCenter)
 
         self.selected_display = 0 
-
+        # 1 once the styles of a group were chosen in its popup
+        self.selected_display_analog = 0
+        self.selected_display_binary = 0
+
+        # Saved style profiles, the chosen one styles the trends by name
+        self.profile_box = QHBoxLayout()
+        self.profile_label = QLabel("Style Profile:")
+        self.profile_combo = QComboBox()
+        self.profile_combo.addItem("None")
+        self.profile_combo.addItems(rules.list_profiles())
+        self.profile_box.addWidget(self.profile_label)
+        self.profile_box.addWidget(self.profile_combo)
+        self.rule_sets = {}
+
+        # Progress of the import/build running in the background
+        self.task = None
+        self.progress_box = QHBoxLayout()
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setFormat("%v trends")
+        # A busy bar shows no text, tasks without a total show their count here
+        self.progress_label = QLabel()
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.clicked.connect(self.cancel_task)
+        self.progress_box.addWidget(self.progress_bar)
+        self.progress_box.addWidget(self.progress_label)
+        self.progress_box.addWidget(self.cancel_button)
+        self.progress_bar.hide()
+        self.progress_label.hide()
+        self.cancel_button.hide()
+
+        layout.addLayout(self.profile_box)
         layout.addLayout(self.button_layout)
+        layout.addWidget(self.delta_check)
+        layout.addLayout(self.output_box)
         layout.addWidget(self.submit_button)
+        layout.addWidget(self.restyle_button)
+        layout.addLayout(self.progress_box)
         layout.addWidget(self.footnote_label)
 
         self.setLayout(layout)
@@ -348,7 +488,11 @@ class MyWidget(QWidget):
         """
             Parses a selected XML file and extracts relevant information.
 
-            This method attempts to parse the XML file specified in the `result_display` line edit.
+            This method parses the XML file specified in the `result_display` line edit
+            with the streaming importer (see `importer.parse_export`), so big exports are
+            read in one pass without keeping the whole tree in memory. Results are kept
+            in the on-disk cache of `cache.parse_export_cached`, reopening the same file
+            does not parse it again.
             It extracts the following information from the XML:
 
             - RuntimeVersion
@@ -361,65 +505,112 @@ class MyWidget(QWidget):
                 A dictionary containing the parsed information from the XML file,
                 or an empty dictionary if parsing fails or the file is not found.
         """
+        from xml.etree.ElementTree import ParseError
+
         try:
-            # Parse the XML file
-            tree = ET.parse(self.result_display.text())
-            root = tree.getroot()
-
-            # Extract RuntimeVersion and ServerFullPath from MetaInformation
-            meta_info = root.find('MetaInformation')
-            if meta_info is not None:
-                runtime_version = meta_info.find(".//RuntimeVersion")
-                if runtime_version is not None:
-                    self.result["RuntimeVersion"] = runtime_version.attrib.get('Value')
-
-                server_full_path = meta_info.find(".//ServerFullPath")
-                if server_full_path is not None:
-                    self.result["ServerFullPath"] = server_full_path.attrib.get('Value')
-
-            # Flags to check if we've already found a reference for Analog and Binary groups
-            analog_reference_found = False
-            binary_reference_found = False
-            pattern = r"^(Binary Group|Analog Group)$"
-
-            # Extract top-level "Trend" OI and its sub-OIs
-            exported_objects = root.find('ExportedObjects')
-            if exported_objects is not None:
-                trend_group = exported_objects.find(".//OI[@NAME='Trend']")
-                if trend_group is not None:
-                    trend_groups = {"Binary Group":[], "Analog Group":[]}
-                    
-                    # Extract sub-OIs under "Trend"
-                    for sub_oi in trend_group.findall(".//OI"):
-                        group_name = sub_oi.attrib.get('NAME')
-                        type_folder = sub_oi.attrib.get('TYPE')
-                        if re.match(pattern,group_name):
-                            for t_oi in sub_oi.findall(".//OI"):
-                                sub_oi_name = t_oi.attrib.get('NAME')
-                                reference_object = t_oi.find(".//Reference")
-                                parse_path = lambda s: s.replace("Data", "Trend").rsplit('/', 1)[0]
-                                if group_name == "Analog Group" and not analog_reference_found:
-                                    if type_folder == "modbus.folder.DeviceFolder":                                    
-                                        self.modbus_check.setChecked(True)
-                                    analog_reference_found = reference_object.attrib.get('Object')     
-                                    self.result["Path Analog"] = parse_path(analog_reference_found)                             
-                                elif group_name == "Binary Group" and not binary_reference_found:
-                                    if type_folder == "modbus.folder.DeviceFolder":
-                                        self.modbus_check.setChecked(True)
-                                    binary_reference_found = reference_object.attrib.get('Object')
-                                    self.result["Path Binary"] = parse_path(binary_reference_found)  
-                                    
-                                trend_groups[group_name].append(sub_oi_name)
-
-                    self.result["Trends"] = trend_groups
-
-            return self.result
-        except ET.ParseError as e:
+            parsed = parse_export_cached(self.result_display.text())
+        except ParseError as e:
             return {}
         except FileNotFoundError:
             return {}
 
+        return self.store_result(parsed)
+
+    def store_result(self, parsed: dict) -> dict:
+        """
+            Keeps the information returned by `importer.parse_export` in the `result` dictionary.
+
+            Args:
+                parsed: The dictionary returned by `importer.parse_export`.
+
+            Returns:
+                The updated `result` dictionary.
+        """
+        if parsed.pop("Modbus", False):
+            self.modbus_check.setChecked(True)
+        parsed.pop("Conflicts", None)
+
+        self.result.update(parsed)
+        return self.result
+
+    def start_task(self, task: Task, total: int):
+        """
+            Runs a task on the global thread pool and shows its progress.
+
+            While the task runs the Build and "Use this file" buttons are disabled
+            and the Cancel button is shown.
+
+            Args:
+                task: The task to run.
+                total: The number of trends the task will process, 0 if unknown:
+                    the bar is then busy and the count so far is shown next to it.
+        """
+        self.task = task
+        task.signals.progress.connect(self.progress_bar.setValue)
+        task.signals.finished.connect(lambda *_: self.task_done(task))
+        task.signals.failed.connect(lambda *_: self.task_done(task))
+        task.signals.cancelled.connect(lambda: self.task_done(task))
+
+        self.progress_bar.setRange(0, total)
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+        if not total:
+            task.signals.progress.connect(lambda count: self.progress_label.setText(f"{count:,} trends read"))
+            self.progress_label.setText("Reading...")
+            self.progress_label.show()
+        self.cancel_button.show()
+        self.cancel_button.setEnabled(True)
+        self.submit_button.setEnabled(False)
+        self.restyle_button.setEnabled(False)
+        self.process_existing_file.setEnabled(False)
+
+        QThreadPool.globalInstance().start(task)
+
+    def task_done(self, task: Task):
+        """
+            Restores the UI once the background task is over.
+
+            Args:
+                task: The task that ended, nothing is restored if another one
+                    was started meanwhile (e.g. the build after the reference check).
+        """
+        if task is not self.task:
+            return
+        self.task = None
+        self.progress_bar.hide()
+        self.progress_label.hide()
+        self.cancel_button.hide()
+        self.submit_button.setEnabled(True)
+        self.restyle_button.setEnabled(True)
+        self.process_existing_file.setEnabled(True)
+
+    def cancel_task(self):
+        """
+            Asks the running task to stop.
+        """
+        if self.task is not None:
+            self.task.cancel()
+            self.cancel_button.setEnabled(False)
+
     def insert_information(self):        
+        """
+            Reads the selected XML files in the background and then fills the UI.
+
+            A single file is parsed by `cache.parse_export_cached` on the thread pool.
+            Several files are parsed concurrently in worker processes and merged by
+            `merge.parse_and_merge`. Their total is not known before the end, the
+            number of trends read so far is shown next to the busy progress bar,
+            and `import_finished` receives the result.
+        """
+        if len(self.selected_files) > 1:
+            task = Task(merge.parse_and_merge, list(self.selected_files))
+        else:
+            task = Task(parse_export_cached, self.result_display.text())
+        task.signals.finished.connect(self.import_finished)
+        task.signals.failed.connect(lambda _: self.import_finished({}))
+        self.start_task(task, 0)
+
+    def import_finished(self, parsed: dict):
         """
             Inserts parsed information from the XML file into the UI.
 
@@ -427,51 +618,158 @@ class MyWidget(QWidget):
             and populates the corresponding UI elements (line edits, text edits) with the extracted values.
 
             If the parsing fails or the file is not found, it displays an error message to the user.
-        """
-        result = self.parse_xml_file()
 
-        if self.result and result:
-            buffer_analog_path = self.result["Path Analog"] 
-            buffer_binary_path = self.result["Path Binary"]
-            buffer_version     = self.result["RuntimeVersion"] 
-            buffer_server      = self.result["ServerFullPath"] 
+            Args:
+                parsed: The dictionary returned by `importer.parse_export`, empty if it failed.
+        """
+        conflicts = parsed.get("Conflicts", [])
+        result = self.store_result(parsed) if parsed else {}
+
+        if self.result and result and result["Trends"] is not None:
+            trends = len(self.result["Trends"]["Analog Group"]) + len(self.result["Trends"]["Binary Group"])
+            with metrics.span("insert_information", trends=trends):
+                self.fill_information()
+            if conflicts:
+                QMessageBox.warning(self, "Conflicts between the files", "\n".join(conflicts))
+        else:
+            QMessageBox.information(self, "Um problema ocorreu", "O arquivo não é compativel ou não foi escolhido")
 
-            self.version_edit.setText(buffer_version)
-            self.trend_path_analog.setText(buffer_analog_path) 
-            self.trend_path_binary.setText(buffer_binary_path)
-            self.server_path_edit.setText(buffer_server)
+    def fill_information(self):
+        """
+            Copies the `result` dictionary into the line edits and text edits.
+        """
+        buffer_analog_path = self.result["Path Analog"] 
+        buffer_binary_path = self.result["Path Binary"]
+        buffer_version     = self.result["RuntimeVersion"] 
+        buffer_server      = self.result["ServerFullPath"] 
 
-            self.trend_names_edit_analog.clear() 
-            self.trend_names_edit_binary.clear() 
+        self.version_edit.setText(buffer_version)
+        self.trend_path_analog.setText(buffer_analog_path) 
+        self.trend_path_binary.setText(buffer_binary_path)
+        self.server_path_edit.setText(buffer_server)
 
-            for trend_name in self.result["Trends"]["Binary Group"]:
-                self.trend_names_edit_binary.append(trend_name.strip())   
+        # One document update per list instead of one per trend
+        self.trends_binary.load(self.result["Trends"]["Binary Group"], own_paths(self.result, "Binary Group"))
+        self.trend_names_edit_binary.setPlainText(self.trends_binary.text())
+        self.trends_binary.dirty = False
 
-            for trend_name in self.result["Trends"]["Analog Group"]:
-                self.trend_names_edit_analog.append(trend_name.strip())
+        self.trends_analog.load(self.result["Trends"]["Analog Group"], own_paths(self.result, "Analog Group"))
+        self.trend_names_edit_analog.setPlainText(self.trends_analog.text())
+        self.trends_analog.dirty = False
 
-        else:
-            QMessageBox.information(self, "Um problema ocorreu", "O arquivo não é compativel ou não foi escolhido")
+        self.show_invalid_names(self.trends_analog.invalid + self.trends_binary.invalid)
 
         return None 
 
+    def trends_analog_edited(self):
+        self.trends_analog.dirty = True
+
+    def trends_binary_edited(self):
+        self.trends_binary.dirty = True
+
+    def trend_names(self, trend_list: TrendList, text_edit: QPlainTextEdit) -> list[str]:
+        """
+            Returns the names of a trend list, reading its text box again only if it was edited by hand.
+
+            Args:
+                trend_list: `trends_analog` or `trends_binary`.
+                text_edit: The text box of that list.
+
+            Returns:
+                The deduplicated, validated trend names.
+        """
+        if trend_list.dirty:
+            trend_list.load_text(text_edit.toPlainText())
+            self.show_invalid_names(trend_list.invalid)
+        return trend_list.names
+
+    def kept_styles(self, trend_list: TrendList, chosen: list[Trend], styles: TrendStyles = None) -> TrendStyles:
+        """
+            Gives the trends of a list the styles chosen for them before, found by name.
+
+            Args:
+                trend_list: `trends_analog` or `trends_binary`.
+                chosen: The trends of the context, with the styles chosen in the popup.
+                styles: The styles of the other trends, the default one if None.
+
+            Returns:
+                The styles of the trends of the list, by row.
+        """
+        if styles is None:
+            styles = TrendStyles(len(trend_list))
+        names = trend_list.names
+        rows = {}   # name -> row of its last occurrence, a name found again in another folder takes the next one
+        for trend in chosen:
+            row = rows.get(trend.name)
+            if row is None:
+                row = trend_list.index_of(trend.name)
+            elif row >= 0:
+                row = next((i for i in range(row + 1, len(names)) if names[i] == trend.name), -1)
+            rows[trend.name] = row
+            if row >= 0:
+                styles.set_display_type(row, trend.displayType)
+                styles.colors[row] = int(trend.displayColor)
+        return styles
+
+    def show_invalid_names(self, names: list[str]):
+        """
+            Warns the user about trend names that were left out of the lists, they get no chart.
+
+            Args:
+                names: The rejected names, see `TrendList.invalid`.
+        """
+        if not names:
+            return
+        limit = 10
+        shown = "\n".join(names[:limit])
+        if len(names) > limit:
+            shown += f"\n... and {len(names) - limit} more"
+        forbidden = " ".join(f"'{character}'" for character in TrendList.FORBIDDEN)
+        QMessageBox.warning(self, "Invalid trend names",
+                            f"{len(names)} trend names hold {forbidden} and get no chart:\n\n{shown}")
+
+    def rule_set(self):
+        """
+            Returns the compiled rules of the chosen style profile.
+
+            Each profile is read and compiled once, its matches stay cached by
+            trend name for the next popups and builds.
+
+            Returns:
+                The `rules.RuleSet`, None if no profile is chosen or it can't be read.
+        """
+        if self.profile_combo.currentIndex() <= 0:
+            return None
+
+        name = self.profile_combo.currentText()
+        if name not in self.rule_sets:
+            try:
+                self.rule_sets[name] = rules.load_profile(name)
+            except (OSError, ValueError) as e:
+                QMessageBox.critical(self, "Um problema ocorreu", f"ERROR: {str(e)}")
+                return None
+        return self.rule_sets[name]
+
     def search_files(self):
         """
-            Opens a file dialog to select an XML file.
+            Opens a file dialog to select one or more XML files.
 
-            This method allows the user to choose an XML file using a file dialog.
-            If a file is selected, it updates the `result_display` line edit with the file path.
+            This method allows the user to choose XML files using a file dialog.
+            If files are selected, they are kept in `selected_files` and the
+            `result_display` line edit shows their paths.
         """
         # Open a file dialog to select a directory
         files, _ = QFileDialog.getOpenFileNames(self, 'Select Files')
 
         if files:
             # Display the selected files
+            self.selected_files = files
             self.result_display.clear()
-            self.result_display.setText(files[0])
+            self.result_display.setText("; ".join(files))
             self.selected_display_analog = 0 
             self.selected_display_binary = 0
         else:
+            self.selected_files = []
             self.result_display.setText("No files selected.")
     
     def show_display_type_popup_analog(self, mode: bool= True):
@@ -479,26 +777,46 @@ class MyWidget(QWidget):
             Opens a popup to configure display types for analog trends.
 
             This method opens a `DisplayTypePopup` dialog to allow the user to configure
-            the display type and color for each analog trend name retrieved from the `trend_names_edit_analog` text edit.
+            the display type and color for each analog trend name of `trends_analog` (the `trend_names_edit_analog` text edit).
+            With a style profile chosen, the trends start with the styles its rules give them
+            (see `rules.RuleSet`), also when the popup is not shown.
 
             Args:
                 mode(bool): A boolean flag indicating whether to show the popup for user interaction
                 (True) or to set default display types and colors (False).
         """
-        trend_names = self.trend_names_edit_analog.toPlainText().split("\n")
-        trend_names = [name for name in trend_names if name]  # Filter empty lines
+        # Only the list parsing and the popup construction are measured, not the user
+        with metrics.span("popup_analog", interactive=mode) as entry:
+            trend_names = self.trend_names(self.trends_analog, self.trend_names_edit_analog)
+            entry["trends"] = len(trend_names)
+            rule_set = self.rule_set()
+            styles = rule_set.styles("Analog Group", trend_names) if rule_set is not None and mode else None
+            if mode and self.selected_display_analog:
+                # The styles chosen the last time stay with their trends, also after an edit
+                styles = self.kept_styles(self.trends_analog, self.context["trendNameAnalog"], styles)
+            popup = DisplayTypePopup(trend_names, DISPLAY_TYPES, self, styles) if mode else None
 
         if mode:
-            popup = DisplayTypePopup(trend_names, {"Line": 0, "Discrete Line": 1, "Digital": 2, "Bars": 3}, self)
             if popup.exec_() == QDialog.Accepted:
                 selected_types, selected_colors = popup.get_selected_display_types()
+                trend_paths = self.trends_analog.paths
                 self.context["trendNameAnalog"] = [
-                    {"name": trend_names[i].strip(), "displayType": selected_types[i], "displayColor":selected_colors[i]} for i in range(len(trend_names))
+                    Trend(trend_names[i], selected_types[i], selected_colors[i], trend_paths[i]) for i in range(len(trend_names))
                 ]
                 self.selected_display_analog = 1 
+        elif self.selected_display_analog:
+            # Trend names edited since the popup: the new ones get the default style
+            styles = self.kept_styles(self.trends_analog, self.context["trendNameAnalog"])
+            trend_paths = self.trends_analog.paths
+            self.context["trendNameAnalog"] = [
+                Trend(trend_names[i], styles.display_types[i], styles.colors[i], trend_paths[i]) for i in range(len(trend_names))
+            ]
+        elif self.selected_display_analog == 0 and rule_set is not None:
+            self.context["trendNameAnalog"] = rule_set.trends("Analog Group", trend_names, self.trends_analog.paths)
         elif self.selected_display_analog == 0:
+            trend_paths = self.trends_analog.paths
             self.context["trendNameAnalog"] = [
-                {"name": trend_names[i].strip(), "displayType": 0, "displayColor":"-11179217"} for i in range(len(trend_names))
+                Trend(trend_names[i], 0, "-11179217", trend_paths[i]) for i in range(len(trend_names))
             ]
 
     def show_display_type_popup_binary(self, mode: bool= True):
@@ -506,38 +824,57 @@ class MyWidget(QWidget):
             Opens a popup to configure display types for binary trends.
 
             This method functions similarly to `show_display_type_popup_analog`
-            but configures display types and colors for binary trends retrieved from
-            the `trend_names_edit_binary` text edit.
+            but configures display types and colors for binary trends of `trends_binary`
+            (the `trend_names_edit_binary` text edit).
 
             Args:
                 mode(bool): A boolean flag indicating whether to show the popup for user interaction
                 (True) or to set default display types and colors (False).
         """
-        trend_names = self.trend_names_edit_binary.toPlainText().split("\n")
-        trend_names = [name for name in trend_names if name]  # Filter empty lines
-        
+        # Only the list parsing and the popup construction are measured, not the user
+        with metrics.span("popup_binary", interactive=mode) as entry:
+            trend_names = self.trend_names(self.trends_binary, self.trend_names_edit_binary)
+            entry["trends"] = len(trend_names)
+            rule_set = self.rule_set()
+            styles = rule_set.styles("Binary Group", trend_names) if rule_set is not None and mode else None
+            if mode and self.selected_display_binary:
+                # The styles chosen the last time stay with their trends, also after an edit
+                styles = self.kept_styles(self.trends_binary, self.context["trendNameBinary"], styles)
+            popup = DisplayTypePopup(trend_names, DISPLAY_TYPES, self, styles) if mode else None
+
         if mode:
-            popup = DisplayTypePopup(trend_names, {"Line": 0, "Discrete Line": 1, "Digital": 2, "Bars": 3}, self)
             if popup.exec_() == QDialog.Accepted:
                 selected_types, selected_colors = popup.get_selected_display_types()
+                trend_paths = self.trends_binary.paths
                 self.context["trendNameBinary"] = [
-                    {"name": trend_names[i].strip(), "displayType": selected_types[i], "displayColor":selected_colors[i]} for i in range(len(trend_names))
+                    Trend(trend_names[i], selected_types[i], selected_colors[i], trend_paths[i]) for i in range(len(trend_names))
                 ]
                 self.selected_display_binary = 1 
+        elif self.selected_display_binary:
+            # Trend names edited since the popup: the new ones get the default style
+            styles = self.kept_styles(self.trends_binary, self.context["trendNameBinary"])
+            trend_paths = self.trends_binary.paths
+            self.context["trendNameBinary"] = [
+                Trend(trend_names[i], styles.display_types[i], styles.colors[i], trend_paths[i]) for i in range(len(trend_names))
+            ]
+        elif self.selected_display_binary == 0 and rule_set is not None:
+            self.context["trendNameBinary"] = rule_set.trends("Binary Group", trend_names, self.trends_binary.paths)
         elif self.selected_display_binary == 0:
+            trend_paths = self.trends_binary.paths
             self.context["trendNameBinary"] = [
-                {"name": trend_names[i].strip(), "displayType": 0, "displayColor":"-11179217"} for i in range(len(trend_names))
+                Trend(trend_names[i], 0, "-11179217", trend_paths[i]) for i in range(len(trend_names))
             ]
 
     def format_xml(self) -> tuple[bool,str]:
         """
             Formats the data for the chart using a Jinja2 template.
 
-            This method uses the Jinja2 templating engine to format the data stored in the
-            `context` dictionary into an XML file. It sets the base node based on the Modbus checkbox selection
+            This method uses the Jinja2 templating engine (through the GUI-free `engine` module)
+            to format the data stored in the `context` dictionary into an XML file. It sets the base node based on the Modbus checkbox selection
             and server version.
 
-            If successful, it saves the formatted XML to a file named after the current date and time.
+            If successful, it saves the formatted XML to a file named after the current date and time,
+            streamed into a gzip or zip file when one is chosen in `output_combo` (see `archive.py`).
 
             Args:
                 None
@@ -547,28 +884,129 @@ class MyWidget(QWidget):
                 The message string contains either the success message with the saved filename
                 or an error message.
         """
+        ok, log = self.prepare_build()
+        if not ok:
+            return ok, log
+
+        return manifest.build(self.context, self.name, delta=self.delta_check.isChecked(),
+                              output_format=self.output_combo.currentData())
+
+    def prepare_build(self) -> tuple[bool,str]:
+        """
+            Sets the base node and the file name before a build.
+
+            Returns:
+                A tuple containing a boolean indicating success and an error message string.
+        """
         try:
-            if self.modbus_check.isChecked() and int(self.context["serverVersion"].split(".")[0]) < 6:
-                print("modbus choosen")
-                self.context["baseNode"] = "modbus.folder.DeviceFolder"
-            else:
-                self.context["baseNode"] = "system.base.Folder"
-
-            env = jinja2.Environment(loader=jinja2.FileSystemLoader('./templates'))
-            template = env.get_template('template.jinja2')
-            output = template.render(self.context)            
-
-            if not self.name:
-                self.name = datetime.now().strftime("%d-%m-%Y-%H-%M-%S")
-            
-            with open(f"./output/{self.name}.xml", "w", encoding="utf-8") as file:
-                file.write(output)
-
-            return True, f"Saved as: {self.name}.xml"
-            
-        except Exception as e:        
+            self.context["baseNode"] = engine.base_node(self.context["serverVersion"], self.modbus_check.isChecked())
+        except Exception as e:
             return False, f"ERROR: {str(e)}"
 
+        if not self.name:
+            self.name = datetime.now().strftime("%d-%m-%Y-%H-%M-%S")
+
+        return True, ""
+
+    def check_references(self, context: dict):
+        """
+            Checks on the thread pool that every chart points to a trend of the
+            imported export, then builds (see `confirm_references`).
+
+            Without an imported export there is nothing to check against, the
+            build starts right away.
+
+            Args:
+                context: The chart context to build.
+        """
+        if not self.result.get("Paths"):
+            self.start_build(context)
+            return
+
+        task = Task(validation.missing_references, context, trend_references(self.result))
+        task.signals.finished.connect(lambda missing: self.confirm_references(context, missing))
+        task.signals.failed.connect(lambda error: QMessageBox.information(self, "Operation Finished", f"ERROR: {error}"))
+        task.signals.cancelled.connect(lambda: QMessageBox.information(self, "Operation Finished", "Build cancelled"))
+        self.start_task(task, chart_count(context))
+
+    def confirm_references(self, context: dict, missing: list[dict]):
+        """
+            Builds the charts, unless some point to trends not found in the export
+            and the user goes back to fix them.
+
+            Typos in the trend names or paths are shown with the closest names
+            found, the user chooses to build anyway or not.
+
+            Args:
+                context: The chart context to build.
+                missing: The list returned by `validation.missing_references`.
+        """
+        if missing:
+            answer = QMessageBox.question(
+                self, "Trends not found",
+                f"{len(missing)} charts point to trends not found in the export:\n\n"
+                f"{validation.report(missing, limit=10)}\n\nBuild anyway?",
+                QMessageBox.Yes | QMessageBox.No, QMessageBox.No
+            )
+            if answer != QMessageBox.Yes:
+                return
+        self.start_build(context)
+
+    def build_finished(self, result: tuple[bool, str]):
+        """
+            Tells the user the build is over.
+
+            Args:
+                result: The tuple returned by `manifest.build`.
+        """
+        _, log = result
+        QMessageBox.information(self, "Operation Finished", log)
+
+    def restyle_charts(self):
+        """
+            Changes the display types and colors of an existing chart export.
+
+            The current styles are read back from the chosen file and shown in one
+            `DisplayTypePopup` per group of charts. The file is then copied to
+            `{OUTPUT_DIR}/{file name}-restyled.xml` (compressed like the file) on
+            the thread pool, only the Color and DisplayType values change (see
+            `restyle.restyle`).
+        """
+        # Loaded on first use like the other XML machinery, see the startup benchmark
+        from xml.etree.ElementTree import ParseError
+        import restyle
+
+        path, _ = QFileDialog.getOpenFileName(self, "Select a Chart Export", "", "Chart Exports (*.xml *.xml.gz *.zip)")
+        if not path:
+            return
+
+        try:
+            found = restyle.read_styles(path)
+        except (ParseError, OSError, EOFError, ValueError):
+            QMessageBox.critical(self, "Um problema ocorreu", "O arquivo não é compativel ou não foi escolhido")
+            return
+        if not found:
+            QMessageBox.information(self, "Operation Finished", "No charts found in this file")
+            return
+
+        chosen = {}
+        for group, (names, styles) in found.items():
+            popup = DisplayTypePopup(names, DISPLAY_TYPES, self, styles)
+            popup.setWindowTitle(f"Restyle the charts of {group}")
+            if popup.exec_() != QDialog.Accepted:
+                return
+            display_types, colors = popup.get_selected_display_types()
+            for name, display_type, color in zip(names, display_types, colors):
+                chosen[(group, name)] = (display_type, color)
+
+        name = restyle.restyled_name(path)
+        destination = os.path.join(engine.OUTPUT_DIR, name)
+        task = Task(restyle.restyle, path, destination, lambda group, chart: chosen.get((group, chart)))
+        task.signals.finished.connect(lambda count: QMessageBox.information(self, "Operation Finished", f"Saved as: {name} ({count} charts restyled)"))
+        task.signals.failed.connect(lambda error: QMessageBox.information(self, "Operation Finished", f"ERROR: {error}"))
+        task.signals.cancelled.connect(lambda: QMessageBox.information(self, "Operation Finished", "Restyle cancelled"))
+        self.start_task(task, sum(len(names) for names, _ in found.values()))
+
     def print_values(self):
         """
             Triggers actions before generating the final XML file.
@@ -578,7 +1016,10 @@ class MyWidget(QWidget):
             1. Calls `show_display_type_popup_analog` and `show_display_type_popup_binary` with `mode=False`
             to set default display types and colors if the user hasn't interacted with the popups.
             2. Updates the `context` dictionary with information from various UI elements.
-            3. Calls `format_xml` to generate and save the XML file.
+            3. Checks the chart references against the imported export on the thread pool
+            (see `check_references`), nothing is written if the user goes back to fix them.
+            4. Renders and saves the XML file on the thread pool (the same work as `format_xml`),
+            the progress bar counts the trends written and the result is shown when it is over.
         """
         self.show_display_type_popup_analog(False)
         self.show_display_type_popup_binary(False)
@@ -590,8 +1031,28 @@ class MyWidget(QWidget):
 
         self.name = self.name_edit.text().strip()
 
-        _, log = self.format_xml()
-        QMessageBox.information(self, "Operation Finished", log)
+        ok, log = self.prepare_build()
+        if not ok:
+            QMessageBox.information(self, "Operation Finished", log)
+            return
+
+        self.check_references(dict(self.context))
+
+    def start_build(self, context: dict):
+        """
+            Renders and saves the charts on the thread pool, the result is shown when it is over.
+
+            Args:
+                context: The chart context, `baseNode` must already be set.
+        """
+        total = len(context["trendNameAnalog"]) + len(context["trendNameBinary"])
+
+        task = Task(manifest.build, context, self.name, engine.OUTPUT_DIR, self.delta_check.isChecked(), None,
+                    self.output_combo.currentData())
+        task.signals.finished.connect(self.build_finished)
+        task.signals.failed.connect(lambda error: QMessageBox.information(self, "Operation Finished", f"ERROR: {error}"))
+        task.signals.cancelled.connect(lambda: QMessageBox.information(self, "Operation Finished", "Build cancelled"))
+        self.start_task(task, total)
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
@@ -0,0 +1,212 @@
+import hashlib
+import json
+import os
+
+import engine
+import metrics
+from archive import output_name
+from trends import FIXED_GROUPS, chart_count, chart_groups
+
+MANIFEST_NAME = "manifest.json"
+
+
+def chart_hash(name: str, path: str, display_type, color) -> str:
+    """
+        Hashes everything that changes the rendered fragment of one chart.
+
+        Args:
+            name: The trend name.
+            path: The trend path the reference is built from.
+            display_type: The display type value.
+            color: The signed ARGB color.
+
+        Returns:
+            The hex digest of the chart.
+    """
+    key = f"{name}\0{path}\0{display_type}\0{color}".encode("utf-8")
+    return hashlib.sha1(key).hexdigest()
+
+
+def site_header(context: dict, template: str = None) -> str:
+    """
+        Hashes what every chart of an export shares, a change here changes all of them.
+
+        Args:
+            context: The chart context.
+            template: A custom Jinja2 template file, None for the built-in one.
+
+        Returns:
+            The hex digest of the server version, base node and template.
+    """
+    key = f"{context['serverVersion']}\0{context['baseNode']}\0{engine.template_digest(template or engine.DEFAULT_TEMPLATE)}".encode("utf-8")
+    return hashlib.sha1(key).hexdigest()
+
+
+def chart_key(group: str, item) -> str:
+    """
+        Returns the manifest key of a chart, "{group}/{trend name}" or
+        "{group}/{own path}/{trend name}" for a trend with its own path.
+    """
+    path = item.get("path")
+    return f"{group}/{path}/{item['name']}" if path else f"{group}/{item['name']}"
+
+
+def chart_hashes(context: dict) -> dict:
+    """
+        Hashes every chart of a context.
+
+        Args:
+            context: The chart context.
+
+        Returns:
+            A dictionary mapping the key of each chart (see `chart_key`) to its hash.
+    """
+    hashes = {}
+    for group, items, path in chart_groups(context):
+        for item in items:
+            hashes[chart_key(group, item)] = chart_hash(item["name"], item.get("path") or path,
+                                                        item["displayType"], item["displayColor"])
+    return hashes
+
+
+def load(output_dir: str = engine.OUTPUT_DIR) -> dict:
+    """
+        Reads the manifest of an output folder.
+
+        Args:
+            output_dir: The folder holding the chart exports.
+
+        Returns:
+            The manifest, one entry per server path, empty if there is none yet.
+    """
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME), "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save(manifest: dict, output_dir: str = engine.OUTPUT_DIR) -> None:
+    """
+        Writes the manifest of an output folder, replacing the previous one atomically.
+
+        Args:
+            manifest: The manifest to save.
+            output_dir: The folder holding the chart exports.
+    """
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(path + ".tmp", "w", encoding="utf-8") as file:
+        json.dump(manifest, file)
+    os.replace(path + ".tmp", path)
+
+
+def changed_context(context: dict, previous: dict, hashes: dict, template: str = None) -> tuple[dict, int]:
+    """
+        Keeps only the charts of a context that are new or changed.
+
+        Args:
+            context: The chart context.
+            previous: The manifest entry of the last build of this server.
+            hashes: The chart hashes of the context.
+            template: A custom Jinja2 template file, None for the built-in one.
+
+        Returns:
+            A tuple with a shallow copy of the context holding only the new or
+            changed charts, and the number of charts skipped.
+    """
+    if previous.get("header") != site_header(context, template):
+        return context, 0
+
+    known = previous.get("charts", {})
+    skipped = 0
+
+    def changed(group: str, items: list) -> list:
+        nonlocal skipped
+        kept = []
+        for item in items:
+            key = chart_key(group, item)
+            if known.get(key) == hashes[key]:
+                skipped += 1
+            else:
+                kept.append(item)
+        return kept
+
+    delta = dict(context)
+    for group, names_key, _ in FIXED_GROUPS:
+        delta[names_key] = changed(group, context[names_key])
+    delta["groups"] = [dict(extra, trends=changed(extra["name"], extra["trends"])) for extra in context.get("groups") or ()]
+    return delta, skipped
+
+
+def write(context: dict, path: str, delta: bool = False, progress=None, template: str = None) -> tuple[int, int]:
+    """
+        Writes a chart export and records its chart hashes in the manifest next to it.
+
+        With `delta` only the charts that are new or changed since the last build
+        of the same server are rendered, the others are skipped without rendering.
+        If nothing changed no file is written, a full build always writes one.
+
+        Args:
+            context: The chart context, `baseNode` must already be set.
+            path: The file to write.
+            delta: True to write only the new or changed charts.
+            progress: Optional callable, receives the number of trends rendered so far.
+            template: A custom Jinja2 template file, None for the native emitter.
+
+        Returns:
+            A tuple with the number of charts written and the number of charts skipped.
+    """
+    with metrics.span("build", file=path, delta=delta) as entry:
+        output_dir = os.path.dirname(path) or "."
+        hashes = chart_hashes(context)
+        manifest = load(output_dir)
+        previous = manifest.get(context["serverPath"], {})
+
+        skipped = 0
+        if delta:
+            context, skipped = changed_context(context, previous, hashes, template)
+
+        written = chart_count(context)
+        if written or not delta:
+            engine.write(context, path, progress, template)
+
+        manifest[context["serverPath"]] = {"header": site_header(context, template), "charts": hashes}
+        save(manifest, output_dir)
+
+        entry["trends"] = written
+        entry["skipped"] = skipped
+        return written, skipped
+
+
+def build(context: dict, name: str = "", output_dir: str = engine.OUTPUT_DIR, delta: bool = False,
+          template: str = None, output_format: str = "xml", progress=None) -> tuple[bool, str]:
+    """
+        Same as `engine.build`, but keeps the manifest and can write a delta export.
+
+        Args:
+            context: The chart context, `baseNode` must already be set.
+            name: The file name without extension, the current date and time if empty.
+            output_dir: The folder the file is written to, created if missing.
+            delta: True to write only the new or changed charts.
+            template: A custom Jinja2 template file, None for the native emitter.
+            output_format: "xml", "gz" or "zip", see `engine.build`.
+            progress: Optional callable, receives the number of trends rendered so far.
+
+        Returns:
+            A tuple containing a boolean indicating success and a message string.
+    """
+    try:
+        if not name:
+            name = engine.default_name()
+
+        file_name = output_name(name, output_format)
+        os.makedirs(output_dir, exist_ok=True)
+        written, skipped = write(context, os.path.join(output_dir, file_name), delta, progress, template)
+        if delta and not written:
+            return True, f"Nothing changed, {skipped} charts skipped"
+        if delta:
+            return True, f"Saved as: {file_name} ({written} new or changed, {skipped} skipped)"
+        return True, f"Saved as: {file_name}"
+
+    except Exception as e:
+        return False, f"ERROR: {str(e)}"
@@ -0,0 +1,133 @@
+import os
+
+from cache import parse_export_cached, trend_count
+from trends import PathTable, TrendIndex, trend_paths
+
+GROUP_PATHS = (("Analog Group", "Path Analog"), ("Binary Group", "Path Binary"))
+SHARED_KEYS = ("RuntimeVersion", "ServerFullPath", "Path Analog", "Path Binary")
+
+
+def merge_results(results: list[tuple[str, dict]]) -> tuple[dict, list[str]]:
+    """
+        Merges the information read from several exports.
+
+        Trends are deduplicated by their full reference path (trend path and
+        name) through a hash index, so a trend exported twice is kept once.
+        The first export that has a value wins, every other export holding a
+        different RuntimeVersion, ServerFullPath or trend path is reported.
+        Every trend keeps the path it has in its own export, the trend folders
+        of every export are merged the same way.
+
+        Args:
+            results: `(path, result)` pairs, the results of `importer.parse_export`.
+
+        Returns:
+            A tuple with the merged result and the list of conflict messages.
+    """
+    merged = {key: None for key in SHARED_KEYS}
+    merged["Trends"] = None
+    merged["Modbus"] = False
+    merged["Paths"] = None
+    merged["Folders"] = {}
+    conflicts = []
+    seen = set()
+    path_table = PathTable()
+
+    for path, result in results:
+        name = os.path.basename(path)
+        for key in SHARED_KEYS:
+            value = result.get(key)
+            if value is None:
+                continue
+            if merged[key] is None:
+                merged[key] = value
+            elif merged[key] != value:
+                conflicts.append(f"{name}: {key} is '{value}', '{merged[key]}' was kept")
+
+        merged["Modbus"] = merged["Modbus"] or result.get("Modbus", False)
+        index = TrendIndex(result)
+        for folder in result.get("Folders") or {}:
+            folder_names, folder_paths = merged["Folders"].setdefault(folder, [[], []])
+            for trend, trend_path in zip(index.trends(folder), index.paths(folder)):
+                reference = (folder, trend, trend_path)
+                if reference not in seen:
+                    seen.add(reference)
+                    folder_names.append(trend)
+                    folder_paths.append(-1 if trend_path is None else path_table.add(trend_path))
+
+        if result.get("Trends") is None:
+            continue
+        if merged["Trends"] is None:
+            merged["Trends"] = {"Binary Group": [], "Analog Group": []}
+            merged["Paths"] = {"Binary Group": [], "Analog Group": []}
+
+        for group, path_key in GROUP_PATHS:
+            group_path = (result.get(path_key) or "").strip()
+            names = result["Trends"].get(group, [])
+            for trend, own_path in zip(names, trend_paths(result, group)):
+                trend_path = group_path if own_path is None else own_path
+                reference = (group, f"{trend_path}/{trend}")
+                if reference not in seen:
+                    seen.add(reference)
+                    merged["Trends"][group].append(trend)
+                    merged["Paths"][group].append(path_table.add(trend_path))
+
+    merged["PathTable"] = path_table.paths
+
+    return merged, conflicts
+
+
+def parse_and_merge(paths: list[str], workers: int = None, progress=None) -> dict:
+    """
+        Parses several exports concurrently in worker processes and merges them.
+
+        A file that can't be read is reported with the conflicts, the others
+        are still merged.
+
+        Args:
+            paths: The EBO exports.
+            workers: The number of processes, one per core if None.
+            progress: Optional callable, receives the number of trends read so
+                far each time a file is done.
+
+        Returns:
+            The merged result, with a "Conflicts" list of messages.
+
+        Raises:
+            Exception: The error of the first file if none could be read.
+    """
+    # Process pools pull in multiprocessing, loaded on the first merge only
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    results = {}
+    errors = []
+    trends = 0
+
+    # Spawned, not forked: this runs on a thread of the Qt process, forking it can deadlock
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers or min(len(paths), os.cpu_count() or 1), mp_context=context) as pool:
+        futures = {pool.submit(parse_export_cached, path): path for path in paths}
+        try:
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    results[path] = future.result()
+                except Exception as e:
+                    errors.append((path, e))
+                    continue
+                trends += trend_count(results[path])
+                if progress is not None:
+                    progress(trends)
+        except BaseException:
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    if not results and errors:
+        raise errors[0][1]
+
+    # Merge in the order the files were chosen, not the order they finished
+    merged, conflicts = merge_results([(path, results[path]) for path in paths if path in results])
+    conflicts += [f"{os.path.basename(path)}: {str(error)}" for path, error in errors]
+    merged["Conflicts"] = conflicts
+    return merged
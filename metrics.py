@@ -0,0 +1,120 @@
+"""
+    Opt-in timing and memory instrumentation of the import and build phases.
+
+    Nothing is recorded unless metrics are enabled, either with `enable(path)`
+    (the command line `--metrics FILE` option) or with the environment variable
+    CHART_REPLICATOR_METRICS=FILE. Each finished phase appends one JSON line to
+    the file, e.g.:
+
+        {"phase": "write", "seconds": 0.81, "peak_bytes": 1153024, "trends": 50000, "bytes": 36120412, ...}
+
+    Peak memory comes from tracemalloc, which is started when metrics are
+    enabled and slows Python down a little, hence the opt-in.
+"""
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+ENV_VARIABLE = "CHART_REPLICATOR_METRICS"
+
+_path = None
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def enable(path: str, trace_memory: bool = True) -> None:
+    """
+        Starts recording the phases into a JSON lines file.
+
+        Args:
+            path: The file the records are appended to.
+            trace_memory: False to skip tracemalloc and only record times.
+    """
+    global _path
+    _path = path
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable() -> None:
+    """
+        Stops recording.
+    """
+    global _path
+    _path = None
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def enabled() -> bool:
+    return _path is not None
+
+
+def record(entry: dict) -> None:
+    """
+        Appends one record to the metrics file.
+
+        Args:
+            entry: The JSON serializable record.
+    """
+    line = json.dumps(entry, default=str)
+    with _lock:
+        with open(_path, "a", encoding="utf-8") as file:
+            file.write(line + "\n")
+
+
+@contextmanager
+def span(phase: str, **fields):
+    """
+        Measures one phase.
+
+        The phase can add its own counters (trends, bytes...) to the yielded
+        dictionary. Nested spans are allowed, the peak memory of an inner span
+        also counts for the outer one.
+
+        Args:
+            phase: The name of the phase, e.g. "parse" or "write".
+            fields: Extra values stored with the record.
+
+        Yields:
+            The dictionary of fields of the record, empty and unused when disabled.
+    """
+    if _path is None:
+        yield {}
+        return
+
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        # Keep the outer span's peak before measuring this one from scratch
+        if stack:
+            stack[-1]["peak_bytes"] = max(stack[-1]["peak_bytes"], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+
+    entry = {"phase": phase, "started": time.time(), "pid": os.getpid(), "peak_bytes": 0}
+    entry.update(fields)
+    stack.append(entry)
+    start = time.perf_counter()
+    try:
+        yield entry
+    except BaseException as e:
+        entry["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        entry["seconds"] = time.perf_counter() - start
+        stack.pop()
+        if tracing:
+            entry["peak_bytes"] = max(entry["peak_bytes"], tracemalloc.get_traced_memory()[1])
+            if stack:
+                stack[-1]["peak_bytes"] = max(stack[-1]["peak_bytes"], entry["peak_bytes"])
+        record(entry)
+
+
+if os.environ.get(ENV_VARIABLE):
+    enable(os.environ[ENV_VARIABLE])
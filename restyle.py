@@ -0,0 +1,315 @@
+"""
+    In-place restyle of existing chart exports.
+
+    An export of the Chart folder is read once, as a stream of tags, and
+    copied to a new file byte for byte except for the `Color` and
+    `DisplayType` values of the `trend.view.GraphicalTrendView` charts that
+    are chosen. Nothing is rendered again, so changing the colors of tens of
+    thousands of charts is a scan of the file, not a rebuild.
+
+    `read_styles` reads the current styles back, e.g. to open
+    `DisplayTypePopup` with them. Chart exports written compressed (`.xml.gz`
+    or `.zip`) are read and written back the same way, see `archive.py`.
+"""
+import os
+import re
+import xml.etree.ElementTree as ET
+from fnmatch import translate
+from xml.sax.saxutils import unescape
+
+from archive import export_extension, export_stem, open_export, open_output
+from styles import DISPLAY_TYPES, TrendStyles, argb_to_hex
+
+CHART_TYPE = "trend.view.GraphicalTrendView"
+SERIES_TYPE = "trend.view.TrendLogSeriesProperties"
+KNOWN_DISPLAY_TYPES = frozenset(DISPLAY_TYPES.values())
+READ_SIZE = 1 << 20
+PROGRESS_STEP = 500
+
+# A tag, comments, CDATA and processing instructions first so their content is skipped whole
+TOKEN = re.compile(rb'<!--.*?-->|<!\[CDATA\[.*?\]\]>|<\?.*?\?>|<[^>"\']*(?:(?:"[^"]*"|\'[^\']*\')[^>"\']*)*>', re.S)
+ATTRIBUTE = re.compile(rb'([\w:.-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+VALUE = re.compile(rb'(\bValue\s*=\s*)(?:"[^"]*"|\'[^\']*\')')
+ENTITIES = {"&quot;": '"', "&apos;": "'"}
+SLASH, QUESTION, BANG = b"/?!"
+CHART_MARK = CHART_TYPE.encode("utf-8")
+SERIES_MARK = SERIES_TYPE.encode("utf-8")
+
+
+def attributes(tag: bytes) -> dict:
+    """
+        Reads the attributes of a tag.
+
+        Returns:
+            A dictionary mapping attribute name to its unescaped value.
+    """
+    found = {}
+    for name, double, single in ATTRIBUTE.findall(tag):
+        value = (double if double is not None else single).decode("utf-8")
+        found[name.decode("utf-8")] = unescape(value, ENTITIES) if "&" in value else value
+    return found
+
+
+def set_value(tag: bytes, value) -> bytes:
+    """
+        Replaces the Value attribute of a PI tag.
+    """
+    return VALUE.sub(lambda match: match.group(1) + b'"' + str(value).encode("utf-8") + b'"', tag, count=1)
+
+
+def line_break(space: bytes) -> bytes:
+    """
+        Returns the line break and indentation ending the white space before a tag.
+    """
+    newline = space.rfind(b"\n")
+    if newline < 0:
+        return b""
+    return space[newline - 1 if space[newline - 1:newline] == b"\r" else newline:]
+
+
+def matcher(pattern: str = None, group: str = None):
+    """
+        Creates the selection of charts by name and group.
+
+        Args:
+            pattern: A shell-style name pattern, e.g. "AHU_*", every name if None.
+            group: The name of the folder holding the charts, e.g. "Analog Group", any if None.
+
+        Returns:
+            A callable taking the group and chart name, True for a chosen chart.
+    """
+    name_match = re.compile(translate(pattern)).match if pattern else None
+
+    def matches(chart_group: str, name: str) -> bool:
+        if group is not None and chart_group != group:
+            return False
+        return name_match is None or name_match(name) is not None
+    return matches
+
+
+def read_display_type(value: str) -> int:
+    """
+        Reads a DisplayType value, the ones that are not in `styles.DISPLAY_TYPES`
+        are shown as a line, the default.
+    """
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        return 0
+    return number if number in KNOWN_DISPLAY_TYPES else 0
+
+
+def same_file(source: str, destination: str) -> bool:
+    """
+        Tells if two paths are the same file, through links and case-insensitive file systems.
+    """
+    if os.path.realpath(source) == os.path.realpath(destination):
+        return True
+    try:
+        return os.path.samefile(source, destination)
+    except OSError:
+        return False
+
+
+def read_styles(source) -> dict:
+    """
+        Reads the current style of every chart of an export, in a single streaming pass.
+
+        Args:
+            source: A file path (compressed or not) or a binary file object holding the chart export.
+
+        Returns:
+            A dictionary mapping each group (the folder holding the charts) to a
+            tuple with the chart names and their `styles.TrendStyles`.
+    """
+    if isinstance(source, str):
+        with open_export(source) as file:
+            return read_styles(file)
+
+    found = {}
+    stack = []
+    chart = None   # [group, name, display type, color] of the chart being read
+
+    for event, elem in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            if elem.tag == "OI" and elem.attrib.get("TYPE") == CHART_TYPE:
+                parent = next((name for tag, name in reversed(stack) if tag == "OI"), None)
+                chart = [parent, elem.attrib.get("NAME"), 0, None]
+            elif elem.tag == "PI" and chart is not None:
+                name = elem.attrib.get("Name")
+                if name == "DisplayType":
+                    chart[2] = read_display_type(elem.attrib.get("Value"))
+                elif name == "Color":
+                    chart[3] = int(elem.attrib["Value"])
+            stack.append((elem.tag, elem.attrib.get("NAME")))
+        else:
+            stack.pop()
+            if elem.tag == "OI" and elem.attrib.get("TYPE") == CHART_TYPE and chart is not None:
+                found.setdefault(chart[0], []).append(chart)
+                chart = None
+            elem.clear()
+
+    result = {}
+    for group, charts in found.items():
+        styles = TrendStyles(len(charts))
+        for row, (_, _, display_type, color) in enumerate(charts):
+            styles.set_display_type(row, display_type)
+            if color is not None:
+                styles.colors[row] = color
+        result[group] = ([name for _, name, _, _ in charts], styles)
+    return result
+
+
+def restyle(source: str, destination: str, choose, progress=None) -> int:
+    """
+        Copies a chart export, rewriting the style of the chosen charts.
+
+        Only the Value of their `Color` and `DisplayType` PI changes, every other
+        byte is copied through. A chart drawn as a line has no DisplayType PI,
+        one is added to its series when it gets another display type.
+
+        Args:
+            source: The chart export to read, plain, gzip or zip compressed.
+            destination: The file to write, compressed according to its extension
+                (see `archive.open_output`), removed again if anything goes wrong.
+            choose: Callable taking the group and chart name, returns None to keep
+                the chart as it is, or a tuple with the new display type and the
+                new signed ARGB color, either of them None to keep it.
+            progress: Optional callable, receives the number of charts read so far.
+
+        Returns:
+            The number of charts restyled.
+
+        Raises:
+            ValueError: If the destination is the source, it would be emptied before it is read.
+    """
+    if same_file(source, destination):
+        raise ValueError(f"{os.path.basename(destination)} is the chart export being restyled, choose another output file")
+
+    stack = []        # (kind, tag) per open tag, kind is "chart", "series" or None
+    style = None      # (display type, color) of the open chart, None if it is kept
+    display_seen = False
+    charts = restyled = 0
+
+    try:
+        with open_export(source) as reader, open_output(destination) as writer:
+            buffer = b""
+            while True:
+                data = reader.read(READ_SIZE)
+                buffer += data
+                copied = 0   # the bytes before this position are written already
+                position = 0
+                for match in TOKEN.finditer(buffer):
+                    tag = match.group()
+                    mark = tag[1]
+                    if mark == BANG and tag.startswith(b"<!--") and not tag.endswith(b"-->"):
+                        # A comment cut by the end of the read
+                        break
+                    start = match.start()
+                    position = match.end()
+
+                    if mark == SLASH:
+                        kind, _ = stack.pop()
+                        if kind == "series" and style is not None and style[0] and not display_seen:
+                            # Lines have no DisplayType PI, add one on its own line before the series ends
+                            writer.write(buffer[copied:start])
+                            writer.write(b'<PI Name="DisplayType" Value="%d"/>' % style[0])
+                            writer.write(line_break(buffer[buffer.rfind(b">", 0, start) + 1:start]))
+                            copied = start
+                        elif kind == "chart":
+                            charts += 1
+                            style = None
+                            if progress is not None and charts % PROGRESS_STEP == 0:
+                                progress(charts)
+                        continue
+
+                    if mark == QUESTION or mark == BANG:
+                        continue
+
+                    kind = None
+                    if tag[1:3] == b"OI":
+                        # Attributes are only parsed for the charts and their folder
+                        if CHART_MARK in tag and attributes(tag).get("TYPE") == CHART_TYPE:
+                            kind = "chart"
+                            parent = next((open_tag for _, open_tag in reversed(stack) if open_tag.startswith(b"<OI")), None)
+                            group = attributes(parent).get("NAME") if parent is not None else None
+                            style = choose(group, attributes(tag).get("NAME"))
+                            display_seen = False
+                            restyled += style is not None
+                        elif SERIES_MARK in tag:
+                            kind = "series"
+                    elif style is not None and tag[1:3] == b"PI":
+                        attrib = attributes(tag)
+                        new_tag = None
+                        if attrib.get("Name") == "Color" and style[1] is not None:
+                            new_tag = set_value(tag, style[1])
+                        elif attrib.get("Name") == "DisplayType":
+                            display_seen = True
+                            if style[0] is not None:
+                                new_tag = set_value(tag, style[0])
+                        if new_tag is not None:
+                            writer.write(buffer[copied:start])
+                            writer.write(new_tag)
+                            copied = position
+
+                    if not tag.endswith(b"/>"):
+                        # The group of a chart is the name of its closest OI
+                        stack.append((kind, tag))
+
+                if not data:
+                    if b"<" in buffer[position:]:
+                        raise ValueError(f"unterminated tag at the end of {source}")
+                    writer.write(buffer[copied:])
+                    break
+
+                # Whatever follows the last whole tag waits for the next read
+                writer.write(buffer[copied:position])
+                buffer = buffer[position:]
+
+        if progress is not None:
+            progress(charts)
+        return restyled
+
+    except BaseException:
+        if os.path.exists(destination):
+            os.remove(destination)
+        raise
+
+
+def restyled_name(source: str) -> str:
+    """
+        Returns the file name of the restyled copy of a chart export, compressed like the export.
+    """
+    return export_stem(source) + "-restyled" + export_extension(source)
+
+
+def restyle_file(source: str, destination: str, pattern: str = None, group: str = None,
+                 display_type: int = None, color: int = None) -> tuple[bool, str]:
+    """
+        Gives the same display type and/or color to the charts matching a name
+        pattern and/or group.
+
+        Args:
+            source: The chart export to read.
+            destination: The file to write.
+            pattern: A shell-style name pattern, every chart if None.
+            group: The folder holding the charts, any if None.
+            display_type: The new display type value, kept if None.
+            color: The new signed ARGB color, kept if None.
+
+        Returns:
+            A tuple containing a boolean indicating success and a message string.
+    """
+    try:
+        if display_type is not None and display_type not in DISPLAY_TYPES.values():
+            raise ValueError(f"unknown display type {display_type}")
+
+        matches = matcher(pattern, group)
+        style = (display_type, color)
+        restyled = restyle(source, destination, lambda chart_group, name: style if matches(chart_group, name) else None)
+
+        shown = argb_to_hex(color) if color is not None else "unchanged"
+        return True, f"Saved as: {os.path.basename(destination)} ({restyled} charts restyled, color {shown})"
+
+    except Exception as e:
+        return False, f"ERROR: {str(e)}"
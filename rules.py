@@ -0,0 +1,244 @@
+"""
+    Style profiles: ordered rules giving a display type and color to trends by name.
+
+    A profile is a JSON file in `PROFILE_DIR`, e.g. `profiles/example.json`:
+
+        {
+            "rules": [
+                {"pattern": "*_Alarm*", "displayType": "Bars", "color": "#FFFF0000"},
+                {"pattern": "*_Temp", "group": "Analog Group", "displayType": "Line", "color": "#FF0000FF"},
+                {"pattern": "*_Status", "displayType": "Digital"}
+            ]
+        }
+
+    Patterns are shell-style and case sensitive, `group` is optional and a
+    missing `displayType` or `color` keeps the default one. The first rule
+    that matches a trend wins. The rules of a group are compiled into a single
+    regular expression, each rule one alternative, so a name is matched once
+    whatever the number of rules, and the result is cached by name.
+"""
+import json
+import os
+import re
+from fnmatch import translate
+
+from styles import DEFAULT_HEX_COLOR, DISPLAY_TYPES, TrendStyles, hex_to_argb
+from trends import Trend, chart_groups
+
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles")
+PROFILE_EXTENSION = ".json"
+DEFAULT_DISPLAY_TYPE = 0
+DEFAULT_COLOR = hex_to_argb([DEFAULT_HEX_COLOR])[0]
+
+
+class RuleSet:
+    """
+        The compiled rules of a style profile.
+    """
+    def __init__(self, rules: list[dict], name: str = ""):
+        """
+            Args:
+                rules: The rules, in priority order (see the module documentation).
+                name: The name of the profile.
+
+            Raises:
+                ValueError: If a rule has an unknown display type or an invalid color.
+        """
+        self.name = name
+        self.rules = []
+        for number, rule in enumerate(rules, 1):
+            display_type = rule.get("displayType")
+            if isinstance(display_type, str):
+                if display_type not in DISPLAY_TYPES:
+                    raise ValueError(f"rule {number}: unknown display type '{display_type}'")
+                display_type = DISPLAY_TYPES[display_type]
+            elif display_type is not None and display_type not in DISPLAY_TYPES.values():
+                raise ValueError(f"rule {number}: unknown display type {display_type}")
+
+            color = rule.get("color")
+            if color is not None:
+                try:
+                    color = hex_to_argb([color])[0]
+                except (ValueError, OverflowError):
+                    raise ValueError(f"rule {number}: invalid color '{color}', expected #AARRGGBB")
+
+            self.rules.append((rule.get("pattern") or "*", rule.get("group"), display_type, color))
+
+        self.matchers = {}   # group -> combined pattern of the rules that apply to it
+        self.cache = {}      # (group, name) -> (display type, color), None when no rule matches
+
+    def matcher(self, group: str):
+        """
+            Compiles the rules that apply to a group into one pattern, once per group.
+
+            Returns:
+                The compiled pattern, None if no rule applies to the group.
+        """
+        if group not in self.matchers:
+            alternatives = [
+                f"(?P<rule{index}>{translate(pattern)})"
+                for index, (pattern, rule_group, _, _) in enumerate(self.rules)
+                if rule_group is None or rule_group == group
+            ]
+            self.matchers[group] = re.compile("|".join(alternatives)) if alternatives else None
+        return self.matchers[group]
+
+    def match(self, group: str, name: str):
+        """
+            Finds the style the rules give to a trend.
+
+            Args:
+                group: The chart group, e.g. "Analog Group".
+                name: The trend name.
+
+            Returns:
+                A tuple with the display type and color (each None if the rule
+                keeps it), or None if no rule matches.
+        """
+        key = (group, name)
+        if key in self.cache:
+            return self.cache[key]
+
+        style = None
+        matcher = self.matcher(group)
+        found = matcher.match(name) if matcher is not None else None
+        if found is not None:
+            # The alternatives are tried in order, the one that matched is the first matching rule
+            _, _, display_type, color = self.rules[int(found.lastgroup[4:])]
+            style = (display_type, color)
+        self.cache[key] = style
+        return style
+
+    def apply(self, group: str, names: list[str], styles: TrendStyles) -> int:
+        """
+            Sets the styles of the trends matched by a rule.
+
+            Args:
+                group: The chart group, e.g. "Analog Group".
+                names: The trend names.
+                styles: Their styles, changed in place.
+
+            Returns:
+                The number of trends matched.
+        """
+        matched = 0
+        display_types, colors = styles.display_types, styles.colors
+        for row, name in enumerate(names):
+            style = self.match(group, name)
+            if style is None:
+                continue
+            matched += 1
+            if style[0] is not None:
+                display_types[row] = style[0]
+            if style[1] is not None:
+                colors[row] = style[1]
+        return matched
+
+    def styles(self, group: str, names: list[str]) -> TrendStyles:
+        """
+            Returns the styles of a list of trends, the default one where no rule matches.
+        """
+        styles = TrendStyles(len(names))
+        self.apply(group, names, styles)
+        return styles
+
+    def trends(self, group: str, names: list[str], paths: list = None) -> list[Trend]:
+        """
+            Builds the chart entries of a list of trends, like `engine.default_trends`
+            but styled by the rules.
+
+            Returns:
+                A list of `trends.Trend` records.
+        """
+        if paths is None:
+            paths = [None] * len(names)
+        items = []
+        for name, path in zip(names, paths):
+            style = self.match(group, name) or (None, None)
+            items.append(Trend(
+                name,
+                DEFAULT_DISPLAY_TYPE if style[0] is None else style[0],
+                str(DEFAULT_COLOR if style[1] is None else style[1]),
+                path
+            ))
+        return items
+
+    def apply_context(self, context: dict) -> int:
+        """
+            Restyles the trends of a chart context in place.
+
+            Returns:
+                The number of trends matched.
+        """
+        matched = 0
+        for group, items, _ in chart_groups(context):
+            for item in items:
+                style = self.match(group, item["name"])
+                if style is None:
+                    continue
+                matched += 1
+                if style[0] is not None:
+                    item["displayType"] = style[0]
+                if style[1] is not None:
+                    item["displayColor"] = str(style[1])
+        return matched
+
+
+def list_profiles(directory: str = PROFILE_DIR) -> list[str]:
+    """
+        Lists the saved profiles.
+
+        Returns:
+            The sorted profile names, without extension.
+    """
+    try:
+        entries = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    return sorted(os.path.splitext(entry)[0] for entry in entries if entry.endswith(PROFILE_EXTENSION))
+
+
+def profile_path(name: str, directory: str = PROFILE_DIR) -> str:
+    """
+        Returns the file of a profile, `name` may also be the path of a profile file.
+    """
+    if name.endswith(PROFILE_EXTENSION) or os.sep in name:
+        return name
+    return os.path.join(directory, name + PROFILE_EXTENSION)
+
+
+def load_profile(name: str, directory: str = PROFILE_DIR) -> RuleSet:
+    """
+        Reads and compiles a saved profile.
+
+        Args:
+            name: The profile name, or the path of a profile file.
+            directory: The folder of the saved profiles.
+
+        Returns:
+            The compiled rules.
+
+        Raises:
+            FileNotFoundError: If there is no such profile.
+            ValueError: If the profile is not valid.
+    """
+    path = profile_path(name, directory)
+    with open(path, "r", encoding="utf-8") as file:
+        profile = json.load(file)
+    return RuleSet(profile.get("rules", []), os.path.splitext(os.path.basename(path))[0])
+
+
+def save_profile(name: str, rules: list[dict], directory: str = PROFILE_DIR) -> str:
+    """
+        Saves the rules of a profile, after checking that they compile.
+
+        Returns:
+            The path of the profile file.
+    """
+    RuleSet(rules, name)
+    os.makedirs(directory, exist_ok=True)
+    path = profile_path(name, directory)
+    with open(path + ".tmp", "w", encoding="utf-8") as file:
+        json.dump({"rules": rules}, file, indent=4)
+    os.replace(path + ".tmp", path)
+    return path
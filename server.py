@@ -0,0 +1,401 @@
+"""
+    Local HTTP build service, so several people can build charts from one install.
+
+    Only the standard library is used (asyncio streams), there is nothing else
+    to install. Requests:
+
+        POST /build             JSON chart context, the keys of `engine.new_context`
+        POST /build             an EBO export (any other content type), built with
+                                the default style like "Use this file" + Build,
+                                plain, gzip or zip compressed
+        GET  /health            "ok"
+
+    In a JSON context a trend may have its own `path`, used instead of the
+    trend path of its group, and `groups` lists any extra chart groups as
+    `{"name": ..., "path": ..., "trends": [...]}`.
+
+    The optional `name` query parameter sets the file name of the download,
+    for an export each `group` query parameter (a folder path pattern, see
+    `engine.folder_groups`) charts the trend folders it matches as well.
+    The chart export is streamed back in chunks while it is rendered, it is
+    never held in memory. All requests share one compiled template (a custom
+    one given at start, or the native emitter), at most `max_renders` exports
+    are rendered at once and uploaded exports are parsed in worker processes,
+    so the event loop keeps serving the other requests.
+
+    Examples:
+        python cli.py serve --port 8750
+        curl -X POST --data-binary @export.xml -o charts.xml http://127.0.0.1:8750/build
+        curl -X POST -H "Content-Type: application/json" --data-binary @context.json \\
+             -o charts.xml "http://127.0.0.1:8750/build?name=site-a"
+"""
+import asyncio
+import json
+import multiprocessing
+import os
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, quote, urlsplit
+
+import engine
+import importer
+from trends import Trend
+
+HOST = "127.0.0.1"
+PORT = 8750
+MAX_HEADER_SIZE = 1 << 16
+MAX_BODY_SIZE = 1 << 30
+READ_SIZE = 1 << 20
+# Characters a download name can't hold: they would end the header or leave the folder
+NAME_FORBIDDEN = re.compile(r'[\x00-\x1f\x7f"/\\]')
+GZIP_MAGIC = b"\x1f\x8b"
+ZIP_MAGIC = b"PK\x03\x04"
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           411: "Length Required", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    """
+        Ends a request with an error status, the message is sent as the body.
+    """
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def trends_from_payload(items: list, where: str) -> list[Trend]:
+    """
+        Reads the trends of one group of a JSON payload, names or dictionaries.
+
+        Raises:
+            HTTPError: If an item is not a trend.
+    """
+    if not isinstance(items, list):
+        raise HTTPError(400, f"ERROR: the trends of {where} must be a list")
+    trends = []
+    for item in items:
+        if isinstance(item, str):
+            trends.extend(engine.default_trends([item]))
+        elif isinstance(item, dict) and item.get("name"):
+            trends.append(Trend(
+                str(item["name"]).strip(),
+                int(item.get("displayType", engine.DEFAULT_DISPLAY_TYPE)),
+                item.get("displayColor", engine.DEFAULT_COLOR),
+                str(item["path"]).strip() if item.get("path") else None
+            ))
+        else:
+            raise HTTPError(400, f"ERROR: invalid trend in {where}: {item!r}")
+    return trends
+
+
+def context_from_payload(payload: dict) -> dict:
+    """
+        Creates a chart context from a JSON payload.
+
+        Trends may be given as names only, they get the default style. Without
+        a `baseNode` it is chosen from the server version and the optional
+        `modbus` key, like the command line does.
+
+        Args:
+            payload: The decoded JSON body.
+
+        Returns:
+            The chart context.
+
+        Raises:
+            HTTPError: If the payload is not a chart context.
+    """
+    if not isinstance(payload, dict):
+        raise HTTPError(400, "ERROR: the context must be a JSON object")
+
+    context = engine.new_context()
+    context.update({key: payload[key] for key in context if key in payload})
+
+    for key in ("trendNameAnalog", "trendNameBinary"):
+        context[key] = trends_from_payload(context[key], key)
+
+    groups = []
+    for group in context["groups"]:
+        if not isinstance(group, dict) or not group.get("name"):
+            raise HTTPError(400, f"ERROR: invalid group: {group!r}")
+        groups.append({"name": str(group["name"]), "path": str(group.get("path", "")),
+                       "trends": trends_from_payload(group.get("trends", []), group["name"])})
+    context["groups"] = groups
+
+    if "baseNode" not in payload:
+        context["baseNode"] = engine.base_node(context["serverVersion"], bool(payload.get("modbus", False)))
+    return context
+
+
+def download_name(query: dict) -> str:
+    """
+        Reads the file name of the download from the `name` query parameter.
+
+        Returns:
+            The name without extension, the current date and time if none is given.
+
+        Raises:
+            HTTPError: If the name holds a control character, a quote or a path separator.
+    """
+    name = query.get("name", [""])[0]
+    if NAME_FORBIDDEN.search(name):
+        raise HTTPError(400, f"ERROR: invalid name {name!r}, control characters, quotes and slashes are not allowed")
+    return name or engine.default_name()
+
+
+def content_disposition(name: str) -> str:
+    """
+        Returns the Content-Disposition header of a download.
+
+        Names outside ASCII are sent as RFC 5987 `filename*`, after a plain
+        `filename` with those characters replaced for older clients.
+    """
+    file_name = f"{name}.xml"
+    fallback = file_name.encode("ascii", "replace").decode("ascii").replace("?", "_")
+    if fallback == file_name:
+        return f'attachment; filename="{file_name}"'
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(file_name, safe='')}"
+
+
+def upload_suffix(head: bytes) -> str:
+    """
+        Recognizes a gzip or zip upload by its first bytes.
+
+        Returns:
+            The file extension the upload is spooled with, so the importer decompresses it.
+    """
+    if head.startswith(GZIP_MAGIC):
+        return ".xml.gz"
+    if head.startswith(ZIP_MAGIC):
+        return ".zip"
+    return ".xml"
+
+
+def parse_upload(path: str, groups: list[str] = ()) -> dict:
+    """
+        Reads an uploaded export, runs in a worker process.
+
+        Args:
+            path: The spooled export.
+            groups: Patterns of the extra trend folders to chart.
+
+        Returns:
+            The chart context.
+    """
+    # Not through the parse cache: the temporary path is never asked for again
+    result = importer.parse_export(path)
+    if result["Trends"] is None:
+        raise ValueError("no 'Trend' folder found in the export")
+    context = engine.context_from_result(result)
+    context["groups"] = engine.folder_groups(result, groups)
+    return context
+
+
+class BuildServer:
+    """
+        Serves chart builds over HTTP on the local machine.
+    """
+    def __init__(self, host: str = HOST, port: int = PORT, template: str = None, max_renders: int = None,
+                 workers: int = None):
+        """
+            Args:
+                host: The address to listen on, only this machine by default.
+                port: The TCP port, 0 picks a free one.
+                template: A custom Jinja2 template file, None for the native emitter.
+                max_renders: How many exports may be rendered at once, one per core by default.
+                workers: The number of processes parsing uploads, one per core by default.
+        """
+        self.host = host
+        self.port = port
+        self.template = template
+        self.max_renders = max_renders or os.cpu_count() or 1
+        self.workers = workers
+        self.renders = None
+        self.parsers = None
+        self.server = None
+
+    async def start(self) -> None:
+        """
+            Compiles the template once, starts the parsing processes and listens.
+        """
+        if self.template is not None:
+            engine.get_template(self.template)
+        self.renders = asyncio.Semaphore(self.max_renders)
+        # Spawned, not forked: a worker forked while a client is connected would
+        # inherit its socket and keep the connection open after it is closed
+        self.parsers = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        self.server = await asyncio.start_server(self.handle, self.host, self.port, limit=MAX_HEADER_SIZE)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+        self.parsers.shutdown(wait=False, cancel_futures=True)
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        print(f"Serving chart builds on http://{self.host}:{self.port}/build", flush=True)
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.close()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+            Answers one request, the connection is closed afterwards.
+        """
+        try:
+            method, target, headers = await self.read_head(reader)
+            url = urlsplit(target)
+            if url.path == "/health":
+                await self.send_text(writer, 200, "ok")
+            elif url.path != "/build":
+                raise HTTPError(404, f"ERROR: no such path {url.path}")
+            elif method != "POST":
+                raise HTTPError(405, "ERROR: /build only accepts POST")
+            else:
+                query = parse_qs(url.query)
+                name = download_name(query)
+                context = await self.read_context(reader, headers, query.get("group", []))
+                await self.send_export(writer, context, name)
+        except HTTPError as e:
+            await self.send_text(writer, e.status, str(e))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            await self.send_text(writer, 500, f"ERROR: {str(e)}")
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def read_head(self, reader: asyncio.StreamReader) -> tuple[str, str, dict]:
+        """
+            Reads the request line and headers.
+
+            Returns:
+                A tuple with the method, the target and the headers (lower case names).
+        """
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.LimitOverrunError:
+            raise HTTPError(413, "ERROR: request headers too large")
+
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "ERROR: malformed request line")
+
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                key, value = line.split(":", 1)
+                headers[key.strip().lower()] = value.strip()
+        return method.upper(), target, headers
+
+    async def read_context(self, reader: asyncio.StreamReader, headers: dict, groups: list[str] = ()) -> dict:
+        """
+            Reads the body, a JSON context or an export, into a chart context.
+
+            `groups` are the patterns of the extra trend folders of an export to chart.
+        """
+        if "content-length" not in headers:
+            raise HTTPError(411, "ERROR: a Content-Length is required")
+        try:
+            length = int(headers["content-length"])
+        except ValueError:
+            raise HTTPError(400, "ERROR: invalid Content-Length")
+        if length > MAX_BODY_SIZE:
+            raise HTTPError(413, f"ERROR: the body is bigger than {MAX_BODY_SIZE} bytes")
+
+        if headers.get("content-type", "").split(";")[0].strip() == "application/json":
+            try:
+                payload = json.loads(await reader.readexactly(length))
+            except ValueError as e:
+                raise HTTPError(400, f"ERROR: {str(e)}")
+            try:
+                return context_from_payload(payload)
+            except (TypeError, ValueError) as e:
+                raise HTTPError(400, f"ERROR: {str(e)}")
+
+        # Exports go to a temporary file chunk by chunk, then to a parsing process
+        chunk = await reader.readexactly(min(READ_SIZE, length))
+        remaining = length - len(chunk)
+        file = tempfile.NamedTemporaryFile(suffix=upload_suffix(chunk), delete=False)
+        try:
+            with file:
+                file.write(chunk)
+                while remaining:
+                    chunk = await reader.readexactly(min(READ_SIZE, remaining))
+                    file.write(chunk)
+                    remaining -= len(chunk)
+            try:
+                return await asyncio.get_running_loop().run_in_executor(self.parsers, parse_upload, file.name, groups)
+            except (SyntaxError, ValueError, OSError, EOFError) as e:
+                # ET.ParseError is a SyntaxError, a corrupt or truncated gzip an OSError or EOFError
+                raise HTTPError(400, f"ERROR: {str(e)}")
+        finally:
+            os.remove(file.name)
+
+    async def send_export(self, writer: asyncio.StreamWriter, context: dict, name: str) -> None:
+        """
+            Renders a context and streams it back with chunked transfer encoding.
+
+            Blocks are rendered in a thread, one at a time, and only once the
+            client took the previous one, so a slow client never piles up data.
+        """
+        loop = asyncio.get_running_loop()
+        async with self.renders:
+            chunks = engine.encoded_stream(context, self.template)
+            # Render the first block before the status line, so an error is still a 500
+            chunk = await loop.run_in_executor(None, next, chunks, None)
+
+            writer.write(
+                "HTTP/1.1 200 OK\r\n"
+                "Content-Type: application/xml; charset=utf-8\r\n"
+                f"Content-Disposition: {content_disposition(name)}\r\n"
+                "Transfer-Encoding: chunked\r\n"
+                "Connection: close\r\n\r\n".encode("latin-1")
+            )
+            try:
+                while chunk is not None:
+                    if chunk:
+                        writer.write(b"%x\r\n%b\r\n" % (len(chunk), chunk))
+                        await writer.drain()
+                    chunk = await loop.run_in_executor(None, next, chunks, None)
+            except Exception:
+                # The status is already sent, closing without the last chunk
+                # tells the client the export is incomplete
+                return
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+
+    async def send_text(self, writer: asyncio.StreamWriter, status: int, text: str) -> None:
+        body = text.encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            "Content-Type: text/plain; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n".encode("latin-1") + body
+        )
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+
+def serve(host: str = HOST, port: int = PORT, template: str = None, max_renders: int = None,
+          workers: int = None) -> None:
+    """
+        Runs the build service until interrupted (Ctrl+C).
+    """
+    server = BuildServer(host, port, template, max_renders, workers)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
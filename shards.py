@@ -0,0 +1,132 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import engine
+from archive import output_name
+
+
+def split(context: dict, shard_size: int) -> list[dict]:
+    """
+        Splits the charts of a context into contexts of at most `shard_size` charts.
+
+        The Analog Group charts come first, then the Binary Group ones and the
+        extra groups, in the same order as in the single file. Every shard keeps
+        the server version, server path, trend paths and base node, so it is a
+        valid export on its own.
+
+        Args:
+            context: The chart context.
+            shard_size: The maximum number of charts per shard.
+
+        Returns:
+            The list of shard contexts, at least one.
+    """
+    if shard_size < 1:
+        raise ValueError("the shard size must be at least 1")
+
+    groups = context.get("groups") or []
+    sections = [context["trendNameAnalog"], context["trendNameBinary"]] + [group["trends"] for group in groups]
+    total = sum(len(items) for items in sections)
+
+    shards = []
+    for start in range(0, max(total, 1), shard_size):
+        stop = start + shard_size
+        parts = []
+        offset = 0
+        for items in sections:
+            parts.append(items[max(start - offset, 0):max(stop - offset, 0)])
+            offset += len(items)
+
+        shard = dict(context)
+        shard["trendNameAnalog"], shard["trendNameBinary"] = parts[0], parts[1]
+        # Only the extra groups with charts in this shard are written in it
+        shard["groups"] = [dict(group, trends=part) for group, part in zip(groups, parts[2:]) if part]
+        shards.append(shard)
+    return shards
+
+
+def shard_name(name: str, index: int) -> str:
+    return f"{name}-part-{index + 1:04d}"
+
+
+def write_shard(context: dict, path: str, template: str = None) -> str:
+    """
+        Writes one shard, runs in a worker process.
+
+        Returns:
+            The path written.
+    """
+    engine.write(context, path, template=template)
+    return path
+
+
+def write_shards(context: dict, name: str, output_dir: str = engine.OUTPUT_DIR, shard_size: int = 10000,
+                 workers: int = None, template: str = None, output_format: str = "xml") -> dict:
+    """
+        Writes the charts of a context as several standalone exports, in parallel.
+
+        The shards are `{name}-part-0001.xml`, `{name}-part-0002.xml`... and
+        `{name}.index.json` lists them in import order.
+
+        Args:
+            context: The chart context, `baseNode` must already be set.
+            name: The base name of the files, without extension.
+            output_dir: The folder the files are written to, created if missing.
+            shard_size: The maximum number of charts per shard.
+            workers: The number of processes, one per core if None.
+            template: A custom Jinja2 template file, None for the native emitter.
+            output_format: "xml", or "gz"/"zip" to compress every shard, see `engine.build`.
+
+        Returns:
+            The index, also saved as `{name}.index.json`.
+    """
+    shards = split(context, shard_size)
+    os.makedirs(output_dir, exist_ok=True)
+    paths = [os.path.join(output_dir, output_name(shard_name(name, i), output_format)) for i in range(len(shards))]
+
+    if len(shards) == 1:
+        write_shard(shards[0], paths[0], template)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Wait for every shard, the first error is raised once all are done
+            futures = [pool.submit(write_shard, shard, path, template) for shard, path in zip(shards, paths)]
+            for future in futures:
+                future.result()
+
+    index = {
+        "name": name,
+        "serverPath": context["serverPath"],
+        "serverVersion": context["serverVersion"],
+        "shards": [
+            {
+                "file": os.path.basename(path),
+                "analog": len(shard["trendNameAnalog"]),
+                "binary": len(shard["trendNameBinary"]),
+                "groups": {group["name"]: len(group["trends"]) for group in shard["groups"]}
+            }
+            for shard, path in zip(shards, paths)
+        ]
+    }
+    with open(os.path.join(output_dir, f"{name}.index.json"), "w", encoding="utf-8") as file:
+        json.dump(index, file, indent=2)
+    return index
+
+
+def build(context: dict, name: str = "", output_dir: str = engine.OUTPUT_DIR, shard_size: int = 10000,
+          workers: int = None, template: str = None, output_format: str = "xml") -> tuple[bool, str]:
+    """
+        Same as `engine.build`, but splits the charts into shards of `shard_size` charts.
+
+        Returns:
+            A tuple containing a boolean indicating success and a message string.
+    """
+    try:
+        if not name:
+            name = engine.default_name()
+
+        index = write_shards(context, name, output_dir, shard_size, workers, template, output_format)
+        return True, f"Saved as: {len(index['shards'])} shards listed in {name}.index.json"
+
+    except Exception as e:
+        return False, f"ERROR: {str(e)}"
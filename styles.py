@@ -0,0 +1,97 @@
+import sys
+from array import array
+
+DISPLAY_TYPES = {"Line": 0, "Discrete Line": 1, "Digital": 2, "Bars": 3}
+DEFAULT_HEX_COLOR = "#FF556B2F"
+
+
+def hex_to_argb(colors: list[str]) -> array:
+    """
+        Converts "#AARRGGBB" colors to the signed ARGB integers EBO expects, all at once.
+
+        The hex digits are decoded in one `bytes.fromhex` call and read back as
+        big endian 32 bit integers, no Python level loop per color.
+
+        Args:
+            colors: A list of colors as hex strings ("#RRGGBB" is read as "#00RRGGBB").
+
+        Returns:
+            An `array('i')` with one signed ARGB integer per color.
+    """
+    raw = bytes.fromhex("".join(color[1:].zfill(8) for color in colors))
+    argb = array("i")
+    argb.frombytes(raw)
+    if sys.byteorder == "little":
+        argb.byteswap()
+    return argb
+
+
+def argb_to_hex(color: int) -> str:
+    """
+        Converts a signed ARGB integer back to a "#AARRGGBB" hex string.
+
+        Args:
+            color: The signed ARGB integer.
+
+        Returns:
+            The color as an upper case hex string.
+    """
+    return f"#{color & 0xFFFFFFFF:08X}"
+
+
+class TrendStyles:
+    """
+        Display type and color of every trend, kept in compact typed arrays.
+
+        Display types are one byte per trend and colors are stored already
+        converted to signed ARGB integers, so copying a style to many trends
+        is a single slice assignment.
+    """
+    def __init__(self, size: int, display_type: int = 0, color: str = DEFAULT_HEX_COLOR):
+        """
+            Initializes every trend with the same style.
+
+            Args:
+                size: The number of trends.
+                display_type: The default display type value.
+                color: The default color as a hex string.
+        """
+        self.display_types = array("b", [display_type]) * size
+        self.colors = hex_to_argb([color]) * size
+
+    def __len__(self):
+        return len(self.display_types)
+
+    def set_display_type(self, row: int, display_type: int):
+        self.display_types[row] = display_type
+
+    def set_color(self, row: int, color: str):
+        self.colors[row] = hex_to_argb([color])[0]
+
+    def apply_all(self, source_row: int):
+        """
+            Copies the style of one trend to every trend.
+
+            Args:
+                source_row: The index of the trend to copy from.
+        """
+        self.apply_range(source_row, 0, len(self))
+
+    def apply_range(self, source_row: int, start: int, stop: int):
+        """
+            Copies the style of one trend to the trends in `[start, stop)`.
+
+            Args:
+                source_row: The index of the trend to copy from.
+                start: The first trend to change.
+                stop: The trend after the last one to change.
+        """
+        count = stop - start
+        self.display_types[start:stop] = array("b", [self.display_types[source_row]]) * count
+        self.colors[start:stop] = array("i", [self.colors[source_row]]) * count
+
+    def to_lists(self) -> tuple[list[int], list[int]]:
+        """
+            Returns the display types and signed ARGB colors as plain lists.
+        """
+        return self.display_types.tolist(), self.colors.tolist()
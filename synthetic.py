@@ -0,0 +1,119 @@
+"""
+    Generates synthetic EBO exports of any size, shaped like the ones the
+    importer reads (MetaInformation, ExportedObjects/Trend/Analog Group and
+    Binary Group, one trend log with a Reference per trend).
+
+    Examples:
+        python synthetic.py 100000 exports/site-100k.xml
+        python synthetic.py 1000000 exports/site-1m.xml --binary-ratio 0.5 --modbus
+"""
+import argparse
+import os
+import sys
+
+from xml.sax.saxutils import quoteattr
+
+WRITE_BUFFER = 1 << 20
+
+HEADER = """<?xml version="1.0" encoding="UTF-8"?>
+<ObjectSet ExportMode="Standard" Note="TypesFirst" SemanticsFilter="Standard" Version={version}>
+  <MetaInformation>
+    <ExportMode Value="Standard"/>
+    <SemanticsFilter Value="None"/>
+    <RuntimeVersion Value={version}/>
+    <SourceVersion Value={version}/>
+    <ServerFullPath Value={server}/>
+  </MetaInformation>
+  <ExportedObjects>
+    <OI NAME="Trend" TYPE="system.base.Folder">
+"""
+
+GROUP_START = """      <OI NAME="{group}" TYPE="{folder}">
+"""
+
+TREND = """        <OI NAME={name} TYPE="{log}">
+          <PI Name="LogArchiveSize" Value="5000"/>
+          <PI Name="IncludedProperty">
+            <Reference DeltaFilter="0" Object={reference} Retransmit="0" TransferRate="10"/>
+          </PI>
+        </OI>
+"""
+
+GROUP_END = """      </OI>
+"""
+
+FOOTER = """    </OI>
+  </ExportedObjects>
+</ObjectSet>
+"""
+
+SUFFIXES = ("Temp", "Hum", "Pressure", "Flow", "Status", "Alarm", "Cmd", "Setpoint")
+
+
+def trend_names(group: str, count: int):
+    """
+        Yields realistic looking, unique trend names.
+
+        Args:
+            group: The group the trends belong to, used as a prefix.
+            count: The number of names.
+    """
+    prefix = "AI" if group == "Analog Group" else "BI"
+    for i in range(count):
+        yield f"{prefix}_{i // 64:05d}_{SUFFIXES[i % len(SUFFIXES)]}_{i}"
+
+
+def write_export(path: str, trends: int, binary_ratio: float = 0.3, version: str = "6.0.4.90",
+                 server: str = "/Server 1", modbus: bool = False) -> int:
+    """
+        Writes a synthetic EBO export.
+
+        The file is streamed with buffered writes, it can hold millions of trends
+        without building anything in memory.
+
+        Args:
+            path: The file to write.
+            trends: The total number of trends.
+            binary_ratio: The share of the trends placed in the Binary Group.
+            version: The RuntimeVersion of the export.
+            server: The ServerFullPath of the export.
+            modbus: True to make the groups Modbus device folders.
+
+        Returns:
+            The number of bytes written.
+    """
+    binary = int(trends * binary_ratio)
+    groups = (("Analog Group", trends - binary, "trend.log.ExtendedIntervalLog"),
+              ("Binary Group", binary, "trend.log.ChangeOfValueLog"))
+    folder = "modbus.folder.DeviceFolder" if modbus else "system.base.Folder"
+
+    with open(path, "w", encoding="utf-8", buffering=WRITE_BUFFER) as file:
+        file.write(HEADER.format(version=quoteattr(version), server=quoteattr(server)))
+        for group, count, log in groups:
+            file.write(GROUP_START.format(group=group, folder=folder))
+            for name in trend_names(group, count):
+                reference = quoteattr(f"../../../../Data/{group}/{name}")
+                file.write(TREND.format(name=quoteattr(name), log=log, reference=reference))
+            file.write(GROUP_END)
+        file.write(FOOTER)
+
+    return os.path.getsize(path)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Generates a synthetic EBO export.")
+    parser.add_argument("trends", type=int, help="total number of trends, e.g. 100 up to 1000000")
+    parser.add_argument("path", help="file to write")
+    parser.add_argument("--binary-ratio", type=float, default=0.3, help="share of binary trends")
+    parser.add_argument("--version", default="6.0.4.90", help="RuntimeVersion of the export")
+    parser.add_argument("--server", default="/Server 1", help="ServerFullPath of the export")
+    parser.add_argument("--modbus", action="store_true", help="use Modbus device folders")
+    args = parser.parse_args(argv)
+
+    size = write_export(args.path, args.trends, args.binary_ratio, args.version, args.server, args.modbus)
+    print(f"{args.trends} trends, {size} bytes written to {args.path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+    Remembers parsed exports in a SQLite file.
+"""
+import itertools
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import cache
+import importer
+
+EXPORT = """<?xml version="1.0" encoding="UTF-8"?>
+<ObjectSet ExportMode="Standard" Version="6.0.4.90">
+  <MetaInformation>
+    <RuntimeVersion Value="6.0.4.90"/>
+    <ServerFullPath Value="/Server 1"/>
+  </MetaInformation>
+  <ExportedObjects>
+    <OI NAME="Trend" TYPE="system.base.Folder">
+      <OI NAME="Analog Group" TYPE="system.base.Folder">
+{trends}
+      </OI>
+    </OI>
+  </ExportedObjects>
+</ObjectSet>
+"""
+TREND = """        <OI NAME="{name}" TYPE="trend.log.ExtendedIntervalLog">
+          <PI Name="IncludedProperty"><Reference Object="../../../Data/{name}"/></PI>
+        </OI>"""
+
+
+class ParseExportCachedTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.cache_file = self.path("cache", "exports.sqlite3")
+        # Counts the exports that are really parsed
+        patcher = mock.patch("importer.parse_export", wraps=importer.parse_export)
+        self.parse = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def path(self, *names: str) -> str:
+        return os.path.join(self.directory.name, *names)
+
+    def export(self, name: str, trends: list[str]) -> str:
+        path = self.path(name)
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(EXPORT.format(trends="\n".join(TREND.format(name=trend) for trend in trends)))
+        return path
+
+    def parsed(self) -> int:
+        # `parse_export` opens a path and calls itself with the file
+        return sum(isinstance(call.args[0], str) for call in self.parse.call_args_list)
+
+    def parse_cached(self, path: str) -> list[str]:
+        return cache.parse_export_cached(path, cache_file=self.cache_file)["Trends"]["Analog Group"]
+
+    def test_second_read_is_a_hit(self):
+        path = self.export("site.xml", ["AHU_Temp", "AHU_Hum"])
+        self.assertEqual(self.parse_cached(path), ["AHU_Temp", "AHU_Hum"])
+        counts = []
+        result = cache.parse_export_cached(path, counts.append, self.cache_file)
+        self.assertEqual(result["Trends"]["Analog Group"], ["AHU_Temp", "AHU_Hum"])
+        self.assertEqual(self.parsed(), 1)
+        self.assertEqual(counts, [2])
+
+    def test_copy_is_found_by_content(self):
+        path = self.export("site.xml", ["AHU_Temp"])
+        self.parse_cached(path)
+        shutil.copy(path, self.path("copy.xml"))
+        self.assertEqual(self.parse_cached(self.path("copy.xml")), ["AHU_Temp"])
+        self.assertEqual(self.parsed(), 1)
+
+    def test_modified_export_is_parsed_again(self):
+        path = self.export("site.xml", ["AHU_Temp"])
+        self.parse_cached(path)
+        mtime_ns = os.stat(path).st_mtime_ns
+        self.export("site.xml", ["AHU_Temp", "OAT"])
+        os.utime(path, ns=(mtime_ns + 10 ** 9, mtime_ns + 10 ** 9))
+        self.assertEqual(self.parse_cached(path), ["AHU_Temp", "OAT"])
+        self.assertEqual(self.parsed(), 2)
+
+    def test_least_recently_used_is_evicted(self):
+        clock = SimpleNamespace(time=itertools.count(1).__next__)
+        with mock.patch.object(cache, "MAX_ENTRIES", 2), mock.patch.object(cache, "time", clock):
+            first = self.export("first.xml", ["A"])
+            second = self.export("second.xml", ["B"])
+            third = self.export("third.xml", ["C"])
+            self.parse_cached(first)
+            self.parse_cached(second)
+            # Reading the first export again makes the second the least recently used
+            self.parse_cached(first)
+            self.parse_cached(third)
+            self.assertEqual(self.parsed(), 3)
+
+            self.parse_cached(first)
+            self.parse_cached(third)
+            self.assertEqual(self.parsed(), 3)
+            self.assertEqual(self.parse_cached(second), ["B"])
+            self.assertEqual(self.parsed(), 4)
+
+        connection = cache.connect(self.cache_file)
+        try:
+            self.assertEqual(connection.execute("SELECT COUNT(*) FROM exports").fetchone()[0], 2)
+        finally:
+            connection.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
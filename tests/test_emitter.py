@@ -0,0 +1,65 @@
+"""
+    Renders chart exports with the native emitter instead of the Jinja2 template.
+"""
+import unittest
+import xml.etree.ElementTree as ET
+
+import emitter
+import engine
+from trends import Trend
+
+
+def context() -> dict:
+    context = engine.new_context()
+    context["serverVersion"] = "5.0.3.117"
+    context["serverPath"] = "/Server 1"
+    context["baseNode"] = "modbus.folder.DeviceFolder"
+    context["trendPathAnalog"] = "../../Trend/Analog Group"
+    context["trendPathBinary"] = "../Trend/Binary Group"
+    # Records and JSON context dictionaries, with and without their own path
+    context["trendNameAnalog"] = [Trend("AHU_Temp", 0, "-11179217"), Trend("AHU Hum é", 1, -16776961, "../../Dev 1/A"),
+                                  {"name": "OAT", "displayType": 3, "displayColor": 5},
+                                  {"name": "RAT", "displayType": 2, "displayColor": "-65536", "path": "../Dev 2"}]
+    context["trendNameBinary"] = [Trend("Pump_Status", 2, "-65536")]
+    context["groups"] = [{"name": "Chillers", "path": "../Trend/Site A/Chillers",
+                          "trends": [Trend("CH1_Temp", 0, "-11179217")]},
+                         {"name": "Empty", "path": "", "trends": []}]
+    return context
+
+
+def native(context: dict) -> bytes:
+    return b"".join(engine.encoded_stream(context))
+
+
+def jinja(context: dict) -> bytes:
+    return b"".join(engine.encoded_stream(context, engine.DEFAULT_TEMPLATE))
+
+
+class EmitterTest(unittest.TestCase):
+
+    def test_same_bytes_as_the_template(self):
+        self.assertEqual(native(context()), jinja(context()))
+
+    def test_same_bytes_without_trends(self):
+        empty = engine.new_context()
+        empty["serverVersion"] = "6.0.4.90"
+        self.assertEqual(native(empty), jinja(empty))
+
+    def test_values_are_escaped(self):
+        self.assertEqual(emitter.escape('A&B <"x">'), b"A&amp;B &lt;&quot;x&quot;&gt;")
+        escaped = context()
+        escaped["serverPath"] = '/Server "1"'
+        escaped["trendNameAnalog"] = [Trend('A&B <"x">', 0, "-11179217")]
+        escaped["groups"] = [{"name": "R&D", "path": "../Trend/R&D", "trends": [Trend("T<1>", 0, "-11179217")]}]
+        root = ET.fromstring(native(escaped))
+        self.assertEqual(root.find("MetaInformation/ServerFullPath").get("Value"), '/Server "1"')
+        names = [oi.get("NAME") for oi in root.iter("OI")]
+        self.assertIn('A&B <"x">', names)
+        self.assertIn("R&D", names)
+        references = [reference.get("Object") for reference in root.iter("Reference")]
+        self.assertIn("../../Trend/Analog Group/A&B <\"x\">", references)
+        self.assertIn("../Trend/R&D/T<1>", references)
+
+
+if __name__ == "__main__":
+    unittest.main()
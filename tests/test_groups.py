@@ -0,0 +1,71 @@
+"""
+    Charts the extra trend folders of an export.
+"""
+import io
+import unittest
+
+import engine
+import importer
+
+EXPORT = b"""<?xml version="1.0" encoding="UTF-8"?>
+<ObjectSet ExportMode="Standard" Version="6.0.4.90">
+  <MetaInformation>
+    <RuntimeVersion Value="6.0.4.90"/>
+    <ServerFullPath Value="/Server 1"/>
+  </MetaInformation>
+  <ExportedObjects>
+    <OI NAME="Trend" TYPE="system.base.Folder">
+      <OI NAME="Analog Group" TYPE="system.base.Folder">
+        <OI NAME="AHU_Temp" TYPE="trend.log.ExtendedIntervalLog">
+          <PI Name="IncludedProperty"><Reference Object="../../../../Data/Analog Group/AHU_Temp"/></PI>
+        </OI>
+        <OI NAME="Sub" TYPE="system.base.Folder">
+          <OI NAME="AHU_Hum" TYPE="trend.log.ExtendedIntervalLog">
+            <PI Name="IncludedProperty"><Reference Object="../../../../Data/Analog Group/Sub/AHU_Hum"/></PI>
+          </OI>
+        </OI>
+      </OI>
+      <OI NAME="Binary Group" TYPE="system.base.Folder">
+        <OI NAME="Pump_Status" TYPE="trend.log.ChangeOfValueLog">
+          <PI Name="IncludedProperty"><Reference Object="../../../../Data/Binary Group/Pump_Status"/></PI>
+        </OI>
+      </OI>
+      <OI NAME="Site A" TYPE="system.base.Folder">
+        <OI NAME="Chillers" TYPE="system.base.Folder">
+          <OI NAME="CH1_Temp" TYPE="trend.log.ExtendedIntervalLog">
+            <PI Name="IncludedProperty"><Reference Object="../../../../Data/Site A/Chillers/CH1_Temp"/></PI>
+          </OI>
+        </OI>
+      </OI>
+    </OI>
+  </ExportedObjects>
+</ObjectSet>
+"""
+
+
+class FolderGroupsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.result = importer.parse_export(io.BytesIO(EXPORT))
+
+    def test_every_folder_is_indexed(self):
+        self.assertEqual(sorted(self.result["Folders"]),
+                         ["Trend/Analog Group", "Trend/Analog Group/Sub", "Trend/Binary Group", "Trend/Site A/Chillers"])
+
+    def test_fixed_groups_are_not_charted_twice(self):
+        self.assertIn("AHU_Hum", self.result["Trends"]["Analog Group"])
+        groups = engine.folder_groups(self.result, ["*"])
+        self.assertEqual([group["name"] for group in groups], ["Chillers"])
+        self.assertEqual([trend.name for trend in groups[0]["trends"]], ["CH1_Temp"])
+
+    def test_every_chart_is_written_once(self):
+        context = engine.context_from_result(self.result)
+        context["groups"] = engine.folder_groups(self.result, ["Trend/*", "Trend/*/*"])
+        context["baseNode"] = engine.base_node(context["serverVersion"], False)
+        xml = b"".join(engine.encoded_stream(context)).decode("utf-8")
+        for name in ("AHU_Temp", "AHU_Hum", "Pump_Status", "CH1_Temp"):
+            self.assertEqual(xml.count(f'<OI NAME="{name}" TYPE="trend.view.GraphicalTrendView">'), 1, name)
+
+
+if __name__ == "__main__":
+    unittest.main()
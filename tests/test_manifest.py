@@ -0,0 +1,69 @@
+"""
+    Rebuilds only the charts that changed since the last build.
+"""
+import os
+import tempfile
+import unittest
+
+import engine
+import manifest
+from trends import Trend
+
+
+def context() -> dict:
+    context = engine.new_context()
+    context["serverVersion"] = "6.0.4.90"
+    context["serverPath"] = "/Server 1"
+    context["trendPathAnalog"] = "/Server 1/Trend/Analog Group"
+    context["trendPathBinary"] = "/Server 1/Trend/Binary Group"
+    context["trendNameAnalog"] = [Trend(f"AI_{i}", 0, "-11179217") for i in range(5)]
+    context["trendNameBinary"] = [Trend("BI_1", 2, "-65536")]
+    return context
+
+
+class DeltaBuildTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.output_dir = self.directory.name
+
+    def build(self, context: dict, name: str, delta: bool = True) -> str:
+        ok, message = manifest.build(context, name, self.output_dir, delta=delta)
+        self.assertTrue(ok, message)
+        return message
+
+    def test_first_build_writes_every_chart(self):
+        message = self.build(context(), "first")
+        self.assertEqual(message, "Saved as: first.xml (6 new or changed, 0 skipped)")
+        charts = manifest.load(self.output_dir)["/Server 1"]["charts"]
+        self.assertEqual(len(charts), 6)
+        self.assertIn("Analog Group/AI_0", charts)
+
+    def test_rebuild_without_changes_writes_nothing(self):
+        self.build(context(), "first")
+        message = self.build(context(), "second")
+        self.assertEqual(message, "Nothing changed, 6 charts skipped")
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, "second.xml")))
+
+    def test_one_style_change_writes_one_chart(self):
+        self.build(context(), "first")
+        changed = context()
+        changed["trendNameAnalog"][3]["displayColor"] = "-16776961"
+        message = self.build(changed, "second")
+        self.assertEqual(message, "Saved as: second.xml (1 new or changed, 5 skipped)")
+        with open(os.path.join(self.output_dir, "second.xml"), "r", encoding="utf-8") as file:
+            xml = file.read()
+        self.assertIn('NAME="AI_3"', xml)
+        self.assertNotIn('NAME="AI_2"', xml)
+        self.assertNotIn('NAME="BI_1"', xml)
+
+    def test_full_build_always_writes(self):
+        self.build(context(), "first")
+        message = self.build(context(), "second", delta=False)
+        self.assertEqual(message, "Saved as: second.xml")
+        self.assertTrue(os.path.exists(os.path.join(self.output_dir, "second.xml")))
+
+
+if __name__ == "__main__":
+    unittest.main()
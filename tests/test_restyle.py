@@ -0,0 +1,126 @@
+"""
+    Restyles chart exports in a streaming copy.
+"""
+import os
+import tempfile
+import unittest
+
+import emitter
+import engine
+import restyle
+from archive import open_export, open_output
+from trends import Trend
+
+# Inside the Analog Group: a comment with a '>' and a chart type, and CDATA holding tags
+COMMENT = b'<!-- a > b <OI NAME="x" TYPE="trend.view.GraphicalTrendView"> -->'
+CDATA = b'<![CDATA[ <PI Name="Color" Value="1"/> ]]>'
+
+
+def chart_export(newline: bytes = b"\n") -> bytes:
+    """
+        Renders a small chart export, every trend drawn as a line but the last one.
+    """
+    context = engine.new_context()
+    context["baseNode"] = "system.base.Folder"
+    context["trendPathAnalog"] = "/Server 1/Trend/Analog Group"
+    context["trendNameAnalog"] = [Trend(f"AI_{i}", 0, "-11179217") for i in range(20)]
+    context["trendNameBinary"] = [Trend("BI_1", 2, "-65536")]
+    data = b"".join(emitter.stream(context)).replace(os.linesep.encode("utf-8"), b"\n")
+    marker = b'<OI NAME="Analog Group" TYPE="system.base.Folder">'
+    data = data.replace(marker, marker + b"\n" + COMMENT + CDATA, 1)
+    return data.replace(b"\n", newline)
+
+
+class RestyleTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.source = self.path("charts.xml")
+        self.write(self.source, chart_export())
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory.name, name)
+
+    def write(self, path: str, data: bytes) -> None:
+        with open_output(path) as file:
+            file.write(data)
+
+    def read(self, path: str) -> bytes:
+        with open_export(path) as file:
+            return file.read()
+
+    def test_identity_copy(self):
+        destination = self.path("copy.xml")
+        self.assertEqual(restyle.restyle(self.source, destination, lambda group, name: None), 0)
+        self.assertEqual(self.read(destination), self.read(self.source))
+
+    def test_display_type_added_to_lines(self):
+        destination = self.path("digital.xml")
+        count = restyle.restyle(self.source, destination,
+                                lambda group, name: (2, -65536) if name == "AI_3" else None)
+        self.assertEqual(count, 1)
+        found = restyle.read_styles(destination)
+        names, styles = found["Analog Group"]
+        row = names.index("AI_3")
+        self.assertEqual((styles.display_types[row], styles.colors[row]), (2, -65536))
+        self.assertEqual(styles.display_types[names.index("AI_4")], 0)
+        # The PI goes on its own line at the end of the series, indented like its closing tag
+        data = self.read(destination)
+        chart = data.split(b'<OI NAME="AI_3"')[1].split(b'<OI NAME="AI_4"')[0]
+        self.assertRegex(chart, rb'\n( +)<PI Name="DisplayType" Value="2"/>\n\1</OI>')
+        self.assertEqual(data.replace(chart, b""), self.read(self.source).replace(
+            self.read(self.source).split(b'<OI NAME="AI_3"')[1].split(b'<OI NAME="AI_4"')[0], b""))
+
+    def test_crlf_kept(self):
+        self.write(self.source, chart_export(b"\r\n"))
+        destination = self.path("crlf.xml")
+        restyle.restyle(self.source, destination, lambda group, name: (1, None))
+        data = self.read(destination)
+        self.assertNotIn(b"\n", data.replace(b"\r\n", b""))
+        self.assertEqual(data.count(b'<PI Name="DisplayType" Value="1"/>\r\n'), 21)
+
+    def test_tags_cut_by_reads(self):
+        expected = self.path("expected.xml")
+        restyle.restyle(self.source, expected, lambda group, name: (3, 1))
+        original = restyle.READ_SIZE
+        self.addCleanup(setattr, restyle, "READ_SIZE", original)
+        for size in (1, 7, 16, len(COMMENT) - 1, 100):
+            restyle.READ_SIZE = size
+            copy, styled = self.path(f"copy-{size}.xml"), self.path(f"styled-{size}.xml")
+            restyle.restyle(self.source, copy, lambda group, name: None)
+            self.assertEqual(restyle.restyle(self.source, styled, lambda group, name: (3, 1)), 21)
+            self.assertEqual(self.read(copy), self.read(self.source), size)
+            self.assertEqual(self.read(styled), self.read(expected), size)
+        # The comment and CDATA are copied through untouched, not taken for charts
+        self.assertIn(COMMENT + CDATA, self.read(expected))
+
+    def test_compressed_round_trip(self):
+        expected = self.path("expected.xml")
+        restyle.restyle(self.source, expected, lambda group, name: (1, 5))
+        for extension in (".xml.gz", ".zip"):
+            source = self.path("charts" + extension)
+            self.write(source, self.read(self.source))
+            destination = self.path(restyle.restyled_name(source))
+            self.assertTrue(destination.endswith("-restyled" + extension))
+            self.assertEqual(restyle.restyle(source, destination, lambda group, name: (1, 5)), 21)
+            self.assertEqual(self.read(destination), self.read(expected), extension)
+            self.assertEqual(restyle.read_styles(destination).keys(), {"Analog Group", "Binary Group"})
+
+    def test_source_is_never_overwritten(self):
+        data = self.read(self.source)
+        with self.assertRaises(ValueError):
+            restyle.restyle(self.source, os.path.join(self.directory.name, ".", "charts.xml"), lambda group, name: (1, 5))
+        self.assertEqual(self.read(self.source), data)
+        ok, log = restyle.restyle_file(self.source, self.source, display_type=1)
+        self.assertFalse(ok)
+        self.assertEqual(self.read(self.source), data)
+
+    def test_unknown_display_type_read_as_line(self):
+        self.write(self.source, chart_export().replace(b'<PI Name="DisplayType" Value="2"/>', b'<PI Name="DisplayType" Value="9"/>'))
+        names, styles = restyle.read_styles(self.source)["Binary Group"]
+        self.assertEqual((names, list(styles.display_types)), (["BI_1"], [0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
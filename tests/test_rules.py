@@ -0,0 +1,72 @@
+"""
+    Styles trends by the first rule of a profile that matches them.
+"""
+import tempfile
+import unittest
+
+import engine
+import rules
+
+RED = -65536
+BLUE = -16776961
+
+PROFILE = [
+    {"pattern": "*_Alarm*", "displayType": "Bars", "color": "#FFFF0000"},
+    {"pattern": "AHU_*", "group": "Analog Group", "displayType": "Discrete Line"},
+    {"pattern": "*_Temp", "displayType": "Line", "color": "#FF0000FF"},
+    {"pattern": "*", "group": "Binary Group", "displayType": "Digital"}
+]
+
+
+class RuleSetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.rules = rules.RuleSet(PROFILE)
+
+    def test_first_matching_rule_wins(self):
+        # Matches the first and third rules
+        self.assertEqual(self.rules.match("Analog Group", "Zone_Alarm_Temp"), (3, RED))
+        # Matches the second and third rules, the second keeps the default color
+        self.assertEqual(self.rules.match("Analog Group", "AHU_Temp"), (1, None))
+        self.assertEqual(self.rules.match("Analog Group", "OAT_Temp"), (0, BLUE))
+        self.assertIsNone(self.rules.match("Analog Group", "Pump"))
+
+    def test_rules_of_other_groups_are_skipped(self):
+        # The second rule only applies to the Analog Group, the catch-all only to the Binary Group
+        self.assertEqual(self.rules.match("Binary Group", "AHU_Temp"), (0, BLUE))
+        self.assertEqual(self.rules.match("Binary Group", "AHU_Status"), (2, None))
+        self.assertEqual(self.rules.match("Binary Group", "AHU_Alarm"), (3, RED))
+        self.assertIsNone(self.rules.match("Chillers", "AHU_Status"))
+
+    def test_order_changes_the_winner(self):
+        reordered = rules.RuleSet(list(reversed(PROFILE)))
+        self.assertEqual(reordered.match("Binary Group", "AHU_Alarm"), (2, None))
+        self.assertEqual(reordered.match("Analog Group", "Zone_Alarm_Temp"), (0, BLUE))
+
+    def test_apply_context(self):
+        context = engine.new_context()
+        context["trendNameAnalog"] = engine.default_trends(["AHU_Temp", "Pump"])
+        context["trendNameBinary"] = engine.default_trends(["Fan_Alarm"])
+        self.assertEqual(self.rules.apply_context(context), 2)
+        analog = context["trendNameAnalog"]
+        self.assertEqual((analog[0].displayType, analog[0].displayColor), (1, engine.DEFAULT_COLOR))
+        self.assertEqual((analog[1].displayType, analog[1].displayColor), (0, engine.DEFAULT_COLOR))
+        self.assertEqual(context["trendNameBinary"][0].displayColor, str(RED))
+
+    def test_invalid_rules(self):
+        with self.assertRaises(ValueError):
+            rules.RuleSet([{"pattern": "*", "displayType": "Pie"}])
+        with self.assertRaises(ValueError):
+            rules.RuleSet([{"pattern": "*", "color": "#FFGG0000"}])
+
+    def test_saved_profile(self):
+        with tempfile.TemporaryDirectory() as directory:
+            rules.save_profile("site", PROFILE, directory)
+            self.assertEqual(rules.list_profiles(directory), ["site"])
+            loaded = rules.load_profile("site", directory)
+        self.assertEqual(loaded.name, "site")
+        self.assertEqual(loaded.match("Analog Group", "Zone_Alarm_Temp"), (3, RED))
+
+
+if __name__ == "__main__":
+    unittest.main()
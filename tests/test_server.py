@@ -0,0 +1,106 @@
+"""
+    Builds charts through the HTTP service with a local client.
+"""
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+import server
+import synthetic
+
+# A request that never finishes fails the test instead of hanging it
+TIMEOUT = 60
+
+
+async def request(port: int, method: str, target: str, body: bytes = b"", content_type: str = None) -> tuple[int, bytes, bytes]:
+    """
+        Sends one request and reads the response until the server closes the connection.
+
+        Returns:
+            A tuple with the status, the body (chunked bodies are decoded) and the head.
+    """
+    reader, writer = await asyncio.open_connection(server.HOST, port)
+    head = f"{method} {target} HTTP/1.1\r\nHost: {server.HOST}\r\nContent-Length: {len(body)}\r\n"
+    if content_type:
+        head += f"Content-Type: {content_type}\r\n"
+    writer.write(head.encode("latin-1") + b"\r\n" + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    await writer.wait_closed()
+
+    head, _, body = response.partition(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    if b"transfer-encoding: chunked" in head.lower():
+        chunks = []
+        while True:
+            size, _, body = body.partition(b"\r\n")
+            size = int(size, 16)
+            if not size:
+                break
+            chunks.append(body[:size])
+            body = body[size + 2:]
+        body = b"".join(chunks)
+    return status, body, head
+
+
+class BuildServerTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.export = os.path.join(self.directory.name, "export.xml")
+        synthetic.write_export(self.export, 50)
+        self.server = server.BuildServer(port=0, max_renders=2, workers=1)
+        await self.server.start()
+
+    async def asyncTearDown(self):
+        await self.server.close()
+        self.directory.cleanup()
+
+    def call(self, *args, **kwargs):
+        return asyncio.wait_for(request(self.server.port, *args, **kwargs), TIMEOUT)
+
+    async def test_health(self):
+        self.assertEqual((await self.call("GET", "/health"))[:2], (200, b"ok"))
+
+    async def test_export_uploads(self):
+        with open(self.export, "rb") as file:
+            export = file.read()
+        # The first upload starts the parsing process, every one must end with the connection
+        for _ in range(3):
+            status, body, head = await self.call("POST", "/build?name=site", export)
+            self.assertEqual(status, 200)
+            self.assertTrue(body.rstrip().endswith(b"</ObjectSet>"))
+            self.assertEqual(body.count(b'TYPE="trend.view.GraphicalTrendView"'), 50)
+            self.assertIn(b'Content-Disposition: attachment; filename="site.xml"\r\n', head)
+
+    async def test_json_context(self):
+        payload = {"trendNameAnalog": ["AI_1", {"name": "AI_2", "path": "/Server 1/Other"}],
+                   "trendNameBinary": ["BI_1"]}
+        status, body, _ = await self.call("POST", "/build", json.dumps(payload).encode(), "application/json")
+        self.assertEqual(status, 200)
+        self.assertEqual(body.count(b'TYPE="trend.view.GraphicalTrendView"'), 3)
+        self.assertIn(b"/Server 1/Other/AI_2", body)
+
+    async def test_download_name(self):
+        payload = json.dumps({"trendNameAnalog": ["AI_1"]}).encode()
+        for name in ("a%0d%0aSet-Cookie:%20x", "a%22b", "..%2Fcharts"):
+            status, body, head = await self.call("POST", f"/build?name={name}", payload, "application/json")
+            self.assertEqual(status, 400, name)
+            self.assertNotIn(b"Set-Cookie", head)
+
+        status, _, head = await self.call("POST", "/build?name=S%C3%A3o%20%E6%9D%B1", payload, "application/json")
+        self.assertEqual(status, 200)
+        self.assertIn(b"filename*=UTF-8''S%C3%A3o%20%E6%9D%B1.xml", head)
+
+    async def test_errors(self):
+        self.assertEqual((await self.call("GET", "/build"))[0], 405)
+        self.assertEqual((await self.call("GET", "/nowhere"))[0], 404)
+        self.assertEqual((await self.call("POST", "/build", b"{", "application/json"))[0], 400)
+        self.assertEqual((await self.call("POST", "/build", b"<ObjectSet>"))[0], 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
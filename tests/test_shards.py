@@ -0,0 +1,85 @@
+"""
+    Splits the charts of a context into several standalone exports.
+"""
+import json
+import os
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+
+import engine
+import shards
+from archive import open_export
+from trends import Trend
+
+CHART_TYPE = "trend.view.GraphicalTrendView"
+
+
+def context() -> dict:
+    context = engine.new_context()
+    context["serverVersion"] = "6.0.4.90"
+    context["serverPath"] = "/Server 1"
+    context["trendPathAnalog"] = "/Server 1/Trend/Analog Group"
+    context["trendPathBinary"] = "/Server 1/Trend/Binary Group"
+    context["trendNameAnalog"] = [Trend(f"AI_{i}", 0, "-11179217") for i in range(5)]
+    context["trendNameBinary"] = [Trend(f"BI_{i}", 2, "-65536") for i in range(2)]
+    context["groups"] = [{"name": "Chillers", "path": "/Server 1/Trend/Site A/Chillers",
+                          "trends": [Trend(f"CH_{i}", 0, "-11179217") for i in range(3)]}]
+    return context
+
+
+def chart_names(file) -> list[str]:
+    return [oi.get("NAME") for oi in ET.parse(file).getroot().iter("OI") if oi.get("TYPE") == CHART_TYPE]
+
+
+class SplitTest(unittest.TestCase):
+
+    def test_charts_keep_their_order(self):
+        parts = shards.split(context(), 4)
+        self.assertEqual([len(part["trendNameAnalog"]) for part in parts], [4, 1, 0])
+        self.assertEqual([len(part["trendNameBinary"]) for part in parts], [0, 2, 0])
+        self.assertEqual([[group["name"] for group in part["groups"]] for part in parts], [[], ["Chillers"], ["Chillers"]])
+        self.assertEqual([trend.name for trend in parts[2]["groups"][0]["trends"]], ["CH_1", "CH_2"])
+        for part in parts:
+            self.assertEqual(part["serverPath"], "/Server 1")
+
+    def test_empty_context_is_one_shard(self):
+        self.assertEqual(len(shards.split(engine.new_context(), 4)), 1)
+
+    def test_shard_size_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            shards.split(context(), 0)
+
+
+class WriteShardsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.output_dir = self.directory.name
+
+    def test_index_lists_every_shard(self):
+        index = shards.write_shards(context(), "site", self.output_dir, shard_size=4, workers=2)
+        with open(os.path.join(self.output_dir, "site.index.json"), "r", encoding="utf-8") as file:
+            self.assertEqual(json.load(file), index)
+        self.assertEqual([shard["file"] for shard in index["shards"]],
+                         ["site-part-0001.xml", "site-part-0002.xml", "site-part-0003.xml"])
+        self.assertEqual(index["shards"][1], {"file": "site-part-0002.xml", "analog": 1, "binary": 2, "groups": {"Chillers": 1}})
+
+        names = []
+        for shard in index["shards"]:
+            names += chart_names(os.path.join(self.output_dir, shard["file"]))
+        self.assertEqual(names, [f"AI_{i}" for i in range(5)] + ["BI_0", "BI_1"] + [f"CH_{i}" for i in range(3)])
+
+    def test_gz_shards(self):
+        ok, message = shards.build(context(), "site", self.output_dir, shard_size=6, workers=2, output_format="gz")
+        self.assertTrue(ok, message)
+        self.assertEqual(message, "Saved as: 2 shards listed in site.index.json")
+        self.assertEqual(sorted(os.listdir(self.output_dir)),
+                         ["site-part-0001.xml.gz", "site-part-0002.xml.gz", "site.index.json"])
+        with open_export(os.path.join(self.output_dir, "site-part-0002.xml.gz")) as file:
+            self.assertEqual(chart_names(file), ["BI_1", "CH_0", "CH_1", "CH_2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
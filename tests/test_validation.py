@@ -0,0 +1,60 @@
+"""
+    Checks chart references against the trends of an export.
+"""
+import unittest
+
+import engine
+import validation
+from synthetic import trend_names
+
+PATH = "/Server 1/Trend/Analog Group"
+
+
+def context(names: list[str]) -> dict:
+    context = engine.new_context()
+    context["trendPathAnalog"] = PATH
+    context["trendNameAnalog"] = engine.default_trends(names)
+    return context
+
+
+class MissingReferencesTest(unittest.TestCase):
+
+    def test_every_reference_found(self):
+        references = [f"{PATH}/AHU_Temp", f"{PATH}/AHU_Hum"]
+        self.assertEqual(validation.missing_references(context(["AHU_Temp", "AHU_Hum"]), references), [])
+
+    def test_typo_suggests_close_names(self):
+        references = [f"{PATH}/AHU_Temp", f"{PATH}/AHU_Hum", "/Server 1/Trend/Binary Group/AHU_Tmpp"]
+        missing = validation.missing_references(context(["AHU_Tmp", "AHU_Hum"]), references)
+        self.assertEqual(len(missing), 1)
+        self.assertEqual(missing[0]["group"], "Analog Group")
+        self.assertEqual(missing[0]["reference"], f"{PATH}/AHU_Tmp")
+        # A close name under another path is not a suggestion
+        self.assertEqual(missing[0]["suggestions"], ["AHU_Temp"])
+        self.assertIn("did you mean AHU_Temp?", validation.report(missing))
+
+    def test_swap_and_substitution(self):
+        index = validation.NearMissIndex([(PATH, "AHU_Tmep"), (PATH, "AHU_Temq")])
+        for reference in (f"{PATH}/AHU_Temp", f"{PATH}/Pump"):
+            index.add(reference)
+        self.assertEqual(index.lookup(PATH, "AHU_Tmep"), ["AHU_Temp"])
+        self.assertEqual(index.lookup(PATH, "AHU_Temq"), ["AHU_Temp"])
+
+    def test_large_export_indexes_only_the_missing_names(self):
+        names = list(trend_names("Analog Group", 100000))
+        references = [f"{PATH}/{name}" for name in names]
+        typo = names[500][:-1] + "X"
+        checked = []
+        missing = validation.missing_references(context(names[:500] + [typo]), references, checked.append)
+        self.assertEqual([entry["name"] for entry in missing], [typo])
+        self.assertIn(names[500], missing[0]["suggestions"])
+        self.assertEqual(checked[-1], 501)
+
+        index = validation.NearMissIndex([(PATH, typo)])
+        for reference in references:
+            index.add(reference)
+        self.assertLessEqual(len(index.index), len(typo) + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+class TrendList:
+    """
+        Parsed list of trend names behind one of the trend name text boxes.
+
+        Names are loaded in bulk, stripped, validated and deduplicated once,
+        with an index from name to position. Popups and builds read `names`
+        directly instead of splitting the text box again, and find the row of
+        a name through the index. The names that were rejected are kept in
+        `invalid`.
+
+        Each name has its own path in `paths` (None for the path of the group),
+        so two trends of the same name in different folders are both kept.
+        The paths of an import are remembered: when the text box is read
+        again after an edit, a name gets the path it was imported with.
+    """
+    # A trend name is the last part of a reference path, it can't hold these
+    FORBIDDEN = ("/",)
+
+    def __init__(self, names: list[str] = ()):
+        self.names = []
+        self.paths = []
+        self.index = {}
+        self.invalid = []
+        # name -> the paths it was imported with, in order
+        self.known = {}
+        # True when the text box was edited by hand since the last load
+        self.dirty = False
+        self.load(names)
+
+    def load(self, names, paths: list = None) -> list[str]:
+        """
+            Replaces the list with new names.
+
+            Empty lines and duplicates (same name and path) are dropped, names
+            holding a forbidden character are kept apart in `invalid`.
+
+            Args:
+                names: An iterable of trend names, e.g. the lines of the text box.
+                paths: The own path of each name (see `trends.own_paths`), the
+                    paths it was imported with if None.
+
+            Returns:
+                The valid names, in their first appearance order.
+        """
+        names = [name.strip() for name in names]
+        if paths is None:
+            paths = self.known_paths(names)
+        else:
+            known = {}
+            for name, path in zip(names, paths):
+                known.setdefault(name, []).append(path)
+            self.known = known
+
+        valid = []
+        valid_paths = []
+        index = {}
+        seen = set()
+        invalid = []
+        for name, path in zip(names, paths):
+            if not name or (name, path) in seen:
+                continue
+            if any(character in name for character in self.FORBIDDEN):
+                invalid.append(name)
+                continue
+            seen.add((name, path))
+            index.setdefault(name, len(valid))
+            valid.append(name)
+            valid_paths.append(path)
+
+        self.names = valid
+        self.paths = valid_paths
+        self.index = index
+        self.invalid = invalid
+        self.dirty = False
+        return valid
+
+    def known_paths(self, names: list[str]) -> list:
+        """
+            Gives every name the path it was imported with, the n-th time a
+            name appears gets its n-th path. New names get None.
+        """
+        paths = []
+        counts = {}
+        for name in names:
+            known = self.known.get(name)
+            if not known:
+                paths.append(None)
+                continue
+            count = counts.get(name, 0)
+            counts[name] = count + 1
+            paths.append(known[min(count, len(known) - 1)])
+        return paths
+
+    def load_text(self, text: str) -> list[str]:
+        """
+            Replaces the list with the lines of a text.
+        """
+        return self.load(text.split("\n"))
+
+    def text(self) -> str:
+        """
+            Returns the names as the text shown in the text box, one per line.
+        """
+        return "\n".join(self.names)
+
+    def index_of(self, name: str) -> int:
+        """
+            Returns the first position of a name, -1 if it is not in the list.
+        """
+        return self.index.get(name, -1)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.index
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self.names)
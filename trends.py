@@ -0,0 +1,250 @@
+"""
+    Compact trend records and the per-trend paths of an import.
+
+    Trends of one export often live in several folders (one per Modbus
+    device, for instance), so every trend keeps its own path. The importer
+    stores each distinct path once, in `PathTable`, and every trend points to
+    it by index; the chart context holds one `Trend` record per chart. Both
+    keep memory flat for sites with a million trends: the same path string is
+    shared by all the trends that live in it.
+
+    `TrendIndex` gives every folder of trend logs of an export, whatever its
+    name and depth, the build can turn any of them into a chart group.
+"""
+
+import re
+from bisect import bisect_left
+from fnmatch import translate
+
+# Where the path shared by the trends of each group is kept in the import result
+GROUP_PATH_KEYS = {"Analog Group": "Path Analog", "Binary Group": "Path Binary"}
+# The chart groups every context has, (group, trends key, path key)
+FIXED_GROUPS = (("Analog Group", "trendNameAnalog", "trendPathAnalog"),
+                ("Binary Group", "trendNameBinary", "trendPathBinary"))
+
+
+def in_fixed_group(folder: str) -> bool:
+    """
+        Tells if the trends of a folder already belong to the Analog or Binary group.
+
+        The importer puts every trend found anywhere inside an Analog Group or
+        Binary Group of the 'Trend' folder in that group, subfolders included.
+
+        Args:
+            folder: A folder path of `TrendIndex`, e.g. "Trend/Analog Group/AHU".
+    """
+    parts = folder.split("/")
+    if "Trend" not in parts:
+        return False
+    return any(part in GROUP_PATH_KEYS for part in parts[parts.index("Trend") + 1:])
+
+
+class Trend:
+    """
+        One chart of a context: trend name, display type, color and own path.
+
+        `path` is None for a trend that lives in the path of its group (the
+        `trendPathAnalog`/`trendPathBinary` of the context), so editing the
+        group path still moves it. Items can also be read and written like
+        the dictionaries of a JSON context (`trend["name"]`), the renderers
+        accept both.
+    """
+    __slots__ = ("name", "displayType", "displayColor", "path")
+
+    def __init__(self, name: str, displayType: int, displayColor, path: str = None):
+        self.name = name
+        self.displayType = displayType
+        self.displayColor = displayColor
+        self.path = path
+
+    def __getitem__(self, key: str):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def get(self, key: str, default=None):
+        return getattr(self, key) if key in self.__slots__ else default
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Trend) and all(getattr(self, key) == getattr(other, key) for key in self.__slots__)
+
+    def __repr__(self) -> str:
+        return f"Trend({self.name!r}, {self.displayType!r}, {self.displayColor!r}, {self.path!r})"
+
+    def to_dict(self) -> dict:
+        """
+            Returns the record as a JSON context item, `path` only if the trend has its own.
+        """
+        item = {"name": self.name, "displayType": self.displayType, "displayColor": self.displayColor}
+        if self.path is not None:
+            item["path"] = self.path
+        return item
+
+
+class PathTable:
+    """
+        Interns the paths of an import: each distinct path is stored once and
+        trends refer to it by index.
+    """
+    def __init__(self, paths: list[str] = ()):
+        self.paths = list(paths)
+        self.ids = {path: index for index, path in enumerate(self.paths)}
+
+    def add(self, path: str) -> int:
+        """
+            Returns the index of a path, adding it the first time it is seen.
+        """
+        index = self.ids.get(path)
+        if index is None:
+            index = self.ids[path] = len(self.paths)
+            self.paths.append(path)
+        return index
+
+
+def trend_paths(result: dict, group: str) -> list:
+    """
+        Lists the path of every trend of a group, as found by the importer.
+
+        Args:
+            result: The dictionary returned by `importer.parse_export`.
+            group: The group name, e.g. "Analog Group".
+
+        Returns:
+            One path per trend of `result["Trends"][group]`, None for a trend whose
+            own reference was not found. Equal paths are the same string object.
+    """
+    names = (result.get("Trends") or {}).get(group, [])
+    indexes = (result.get("Paths") or {}).get(group)
+    if indexes is None:
+        return [None] * len(names)
+    table = result.get("PathTable") or []
+    return [table[index] if index >= 0 else None for index in indexes]
+
+
+def own_paths(result: dict, group: str) -> list:
+    """
+        Same as `trend_paths`, but None for the trends that live in the path of their group.
+    """
+    group_path = (result.get(GROUP_PATH_KEYS.get(group)) or "").strip()
+    return [None if path is None or path == group_path else path for path in trend_paths(result, group)]
+
+
+def trend_references(result: dict):
+    """
+        Yields the reference of every trend of an import, its path followed by
+        its name, the trends of the other folders (see `TrendIndex`) included.
+    """
+    for group, names in (result.get("Trends") or {}).items():
+        group_path = (result.get(GROUP_PATH_KEYS.get(group)) or "").strip()
+        for name, path in zip(names, trend_paths(result, group)):
+            yield f"{group_path if path is None else path}/{name}"
+
+    index = TrendIndex(result)
+    for folder in index.folders:
+        group_path = index.group_path(folder)
+        for name, path in zip(index.trends(folder), index.paths(folder)):
+            yield f"{group_path if path is None else path}/{name}"
+
+
+def chart_groups(context: dict):
+    """
+        Yields every chart group of a context: the Analog and Binary groups,
+        then the extra groups of `context["groups"]`.
+
+        Yields:
+            Tuples with the group name, its trends and its trend path.
+    """
+    for group, names_key, path_key in FIXED_GROUPS:
+        yield group, context[names_key], context[path_key]
+    for group in context.get("groups") or ():
+        yield group["name"], group["trends"], group["path"]
+
+
+def chart_count(context: dict) -> int:
+    """
+        Counts the charts of a context, every group included.
+    """
+    return sum(len(items) for _, items, _ in chart_groups(context))
+
+
+class TrendIndex:
+    """
+        Every folder of an import holding trend logs, queryable by folder
+        path prefix or pattern.
+
+        Built from the "Folders" the importer gathers in its single pass over
+        the export, the folder paths are kept sorted so a prefix query is a
+        binary search instead of a scan of every folder.
+    """
+    def __init__(self, result: dict):
+        """
+            Args:
+                result: The dictionary returned by `importer.parse_export`.
+        """
+        self.table = result.get("PathTable") or []
+        self.folders = result.get("Folders") or {}
+        self.order = sorted(self.folders)
+        self.references = None   # (folder, trend name) -> path, built on the first lookup
+
+    def __len__(self) -> int:
+        return len(self.folders)
+
+    def __contains__(self, folder: str) -> bool:
+        return folder in self.folders
+
+    def find(self, prefix: str = "", pattern: str = None) -> list[str]:
+        """
+            Lists the folders whose path starts with a prefix and/or matches a pattern.
+
+            Args:
+                prefix: The start of the folder paths, e.g. "Trend/Site A/".
+                pattern: A shell-style pattern of the whole folder path, e.g. "Trend/*/Chillers".
+
+            Returns:
+                The folder paths, sorted.
+        """
+        if pattern is not None and not prefix:
+            # The literal start of the pattern narrows the search like a prefix
+            prefix = re.split(r"[*?[]", pattern, maxsplit=1)[0]
+        start = bisect_left(self.order, prefix)
+        stop = bisect_left(self.order, prefix + "\U0010ffff", start) if prefix else len(self.order)
+        found = self.order[start:stop]
+        if pattern is not None:
+            match = re.compile(translate(pattern)).match
+            found = [folder for folder in found if match(folder)]
+        return found
+
+    def trends(self, folder: str) -> list[str]:
+        """
+            Returns the trend names of a folder, in the order of the export.
+        """
+        return self.folders[folder][0]
+
+    def paths(self, folder: str) -> list:
+        """
+            Returns the path of every trend of a folder, None for a trend without a reference.
+        """
+        table = self.table
+        return [table[index] if index >= 0 else None for index in self.folders[folder][1]]
+
+    def group_path(self, folder: str) -> str:
+        """
+            Returns the path shared by the trends of a folder, the one of its first referenced trend.
+        """
+        return next((path for path in self.paths(folder) if path is not None), "")
+
+    def reference(self, folder: str, name: str):
+        """
+            Returns the path of a trend, None if the folder has no such trend or it has no reference.
+        """
+        if self.references is None:
+            self.references = {}
+            for key in self.folders:
+                for trend, path in zip(self.trends(key), self.paths(key)):
+                    self.references.setdefault((key, trend), path)
+        return self.references.get((folder, name))
@@ -0,0 +1,138 @@
+"""
+    Checks the chart references against the trends of the source export.
+
+    Every chart points to `{trend path}/{trend name}`. The import records the
+    path of every trend it finds (see `trends.trend_references`), here they
+    go into a hash set and every chart reference is looked up once, so the
+    whole check is linear in the number of charts. For the references that
+    are missing, close names are found through a deletion index (each name
+    and its variants with one character removed) of the missing names only.
+    The known names of the same paths are streamed through it, which finds
+    the names one typo away without comparing every pair, and memory grows
+    with the missing charts instead of the size of the export.
+"""
+from collections import defaultdict
+
+from trends import chart_groups
+
+MAX_SUGGESTIONS = 3
+PROGRESS_STEP = 500
+
+
+def deletions(name: str) -> set[str]:
+    """
+        Returns a name and every variant of it with one character removed.
+    """
+    return {name} | {name[:i] + name[i + 1:] for i in range(len(name))}
+
+
+class NearMissIndex:
+    """
+        Finds the known trends whose name is one edit (insertion, deletion,
+        substitution or swap of two neighbours) away from some names, within
+        the same trend path.
+
+        The names looked for are indexed, then every known reference is given
+        to `add`. Known references of the other paths, or whose length is too
+        far off, are skipped without building their variants.
+    """
+    def __init__(self, wanted):
+        """
+            Args:
+                wanted: The (path, name) of the charts to find close names for.
+        """
+        self.index = defaultdict(set)    # (path, variant) -> the wanted names it comes from
+        self.lengths = defaultdict(set)  # path -> the lengths a close name can have
+        self.found = defaultdict(set)    # (path, wanted name) -> the close known names
+        for path, name in wanted:
+            for variant in deletions(name):
+                self.index[(path, variant)].add(name)
+            self.lengths[path].update((len(name) - 1, len(name), len(name) + 1))
+
+    def add(self, reference: str) -> None:
+        """
+            Args:
+                reference: A known trend reference, "{path}/{name}".
+        """
+        path, _, name = reference.rpartition("/")
+        lengths = self.lengths.get(path)
+        if lengths is None or len(name) not in lengths:
+            return
+        for variant in deletions(name):
+            for wanted in self.index.get((path, variant), ()):
+                if wanted != name:
+                    self.found[(path, wanted)].add(name)
+
+    def lookup(self, path: str, name: str) -> list[str]:
+        """
+            Args:
+                path: The trend path of the chart.
+                name: The trend name of the chart.
+
+            Returns:
+                The close known names, the most similar first.
+        """
+        found = self.found.get((path, name), ())
+        return sorted(found, key=lambda candidate: (abs(len(candidate) - len(name)), candidate))
+
+
+def missing_references(context: dict, references, progress=None) -> list[dict]:
+    """
+        Lists the charts of a context whose reference is not in the source export.
+
+        Args:
+            context: The chart context.
+            references: The trend references of the export, see `trends.trend_references`.
+            progress: Optional callable, receives the number of charts checked so far.
+
+        Returns:
+            One dictionary per missing reference with the group, name, reference
+            and suggestions (close names of the same path), empty if every
+            reference exists.
+    """
+    known = set(references)
+    missing = []
+    checked = 0
+    for group, items, path in chart_groups(context):
+        for item in items:
+            reference = f"{item.get('path') or path}/{item['name']}"
+            if reference not in known:
+                missing.append({"group": group, "name": item["name"], "reference": reference})
+            checked += 1
+            if progress is not None and checked % PROGRESS_STEP == 0:
+                progress(checked)
+
+    if missing:
+        # Only built when something is wrong, a clean build never pays for it
+        for entry in missing:
+            entry["path"] = entry["reference"][:-len(entry["name"]) - 1]
+        near_misses = NearMissIndex((entry["path"], entry["name"]) for entry in missing)
+        for reference in known:
+            near_misses.add(reference)
+        for entry in missing:
+            entry["suggestions"] = near_misses.lookup(entry.pop("path"), entry["name"])[:MAX_SUGGESTIONS]
+    if progress is not None:
+        progress(checked)
+    return missing
+
+
+def report(missing: list[dict], limit: int = None) -> str:
+    """
+        Formats the missing references, one per line.
+
+        Args:
+            missing: The list returned by `missing_references`.
+            limit: The most lines to show, every one if None.
+
+        Returns:
+            The report.
+    """
+    lines = []
+    for entry in missing[:limit]:
+        line = f"{entry['group']}: {entry['reference']} not found in the export"
+        if entry["suggestions"]:
+            line += f" (did you mean {', '.join(entry['suggestions'])}?)"
+        lines.append(line)
+    if limit is not None and len(missing) > limit:
+        lines.append(f"... and {len(missing) - limit} more")
+    return "\n".join(lines)
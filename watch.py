@@ -0,0 +1,201 @@
+"""
+    Watch mode: rebuilds the charts of every export dropped into a folder.
+
+    The folder is polled, so it works the same on local disks and network
+    shares and needs no display nor extra package. A file is only read once
+    its size and modification time stayed the same for `debounce` seconds,
+    so an export still being copied is not parsed half written. Each export
+    then goes through `engine.build_export`, the "Use this file" + Build of
+    the GUI, and is written to `{output_dir}/{export name}.xml` (or `.xml.gz`,
+    `.zip`, see `archive.py`; compressed exports are read as well).
+
+    The content hashes already built are kept in `{output_dir}/watch.json`,
+    a file that is only touched or copied again is skipped, also after a
+    restart. A failing export is reported and retried once it changes. An
+    export that would overwrite the chart file of another one (`site.xml`
+    next to `site.xml.gz`) is reported and retried once the other is gone.
+"""
+import json
+import os
+import time
+from datetime import datetime
+
+import engine
+from archive import export_stem, output_name
+from batch import collision_message, collisions, find_exports
+from cache import file_hash
+
+STATE_NAME = "watch.json"
+DEBOUNCE_SECONDS = 2.0
+POLL_SECONDS = 1.0
+
+
+class Watcher:
+    """
+        Polls one folder and builds the exports that are new or changed.
+    """
+    def __init__(self, directory: str, output_dir: str = engine.OUTPUT_DIR, debounce: float = DEBOUNCE_SECONDS,
+                 log=print, output_format: str = "xml"):
+        """
+            Args:
+                directory: The folder the exports are dropped into.
+                output_dir: The folder the chart files are written to.
+                debounce: How long a file must stay unchanged before it is built, in seconds.
+                log: Callable receiving one message per event.
+                output_format: "xml", "gz" or "zip", see `engine.build`.
+        """
+        if os.path.abspath(directory) == os.path.abspath(output_dir):
+            # The chart files would be picked up as new exports
+            raise ValueError("the output folder can't be the watched folder")
+
+        self.directory = directory
+        self.output_dir = output_dir
+        self.debounce = debounce
+        self.log = log
+        self.output_format = output_format
+        # path -> (size, mtime_ns, time of the last change seen)
+        self.pending = {}
+        # path -> (size, mtime_ns) of the version already handled
+        self.seen = {}
+        self.processed = self.load_state()
+
+    def state_path(self) -> str:
+        return os.path.join(self.output_dir, STATE_NAME)
+
+    def load_state(self) -> dict:
+        """
+            Reads the content hashes built by earlier runs.
+
+            Returns:
+                A dictionary mapping content hash to the chart file written.
+        """
+        try:
+            with open(self.state_path(), "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def save_state(self) -> None:
+        path = self.state_path()
+        with open(path + ".tmp", "w", encoding="utf-8") as file:
+            json.dump(self.processed, file, indent=2)
+        os.replace(path + ".tmp", path)
+
+    def poll(self, now: float = None) -> list[str]:
+        """
+            Looks at the folder once.
+
+            Args:
+                now: The current time, `time.monotonic()` by default.
+
+            Returns:
+                The exports that stopped changing and were not handled yet.
+        """
+        if now is None:
+            now = time.monotonic()
+
+        ready = []
+        current = set()
+        for path in find_exports(self.directory):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            signature = (stat.st_size, stat.st_mtime_ns)
+            current.add(path)
+
+            if self.seen.get(path) == signature:
+                continue
+            pending = self.pending.get(path)
+            if pending is None or pending[:2] != signature:
+                self.pending[path] = (*signature, now)
+            elif now - pending[2] >= self.debounce:
+                del self.pending[path]
+                self.seen[path] = signature
+                ready.append(path)
+
+        # Forget deleted files, so an export put back is built again
+        for path in set(self.pending) - current:
+            del self.pending[path]
+        deleted = set(self.seen) - current
+        for path in deleted:
+            del self.seen[path]
+        # An export left out for sharing its chart file name with a deleted one is built now
+        names = {export_stem(path).lower() for path in deleted}
+        for path in [path for path in self.seen if export_stem(path).lower() in names]:
+            del self.seen[path]
+        return ready
+
+    def process(self, path: str) -> bool:
+        """
+            Builds the charts of one export unless its content was already built.
+
+            Args:
+                path: The export.
+
+            Returns:
+                True if a chart file was written.
+        """
+        try:
+            digest = file_hash(path)
+        except OSError as e:
+            self.log(f"{path}: ERROR: {str(e)}")
+            return False
+
+        if digest in self.processed:
+            self.log(f"{path}: unchanged content, already built as {self.processed[digest]}")
+            return False
+
+        others = collisions(find_exports(self.directory)).get(path)
+        if others:
+            self.log(f"{path}: {collision_message(others)}")
+            return False
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        name = export_stem(path)
+        ok, message = engine.build_export(path, name, self.output_dir, self.output_format)
+        self.log(f"{path}: {message}")
+        if not ok:
+            return False
+
+        self.processed[digest] = output_name(name, self.output_format)
+        try:
+            self.save_state()
+        except OSError as e:
+            self.log(f"{self.state_path()}: ERROR: {str(e)}")
+        return True
+
+    def run_once(self, now: float = None) -> int:
+        """
+            Polls the folder and builds what is ready.
+
+            Returns:
+                The number of chart files written.
+        """
+        written = 0
+        for path in self.poll(now):
+            try:
+                written += self.process(path)
+            except Exception as e:
+                # Whatever happens to one export, the daemon keeps watching
+                self.log(f"{path}: ERROR: {str(e)}")
+        return written
+
+    def run(self, interval: float = POLL_SECONDS) -> None:
+        """
+            Watches the folder until interrupted (Ctrl+C).
+
+            Args:
+                interval: Time between two polls, in seconds.
+        """
+        self.log(f"{datetime.now():%Y-%m-%d %H:%M:%S} watching {self.directory}, charts go to {self.output_dir}")
+        try:
+            while True:
+                try:
+                    self.run_once()
+                except OSError as e:
+                    # The folder itself may vanish for a while, e.g. a network share
+                    self.log(f"{self.directory}: ERROR: {str(e)}")
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            self.log("stopped")
@@ -0,0 +1,77 @@
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+
+class Cancelled(Exception):
+    """
+        Raised inside a task when the user asked it to stop.
+    """
+
+
+class TaskSignals(QObject):
+    """
+        Signals used by `Task` to talk to the GUI thread.
+
+        A QRunnable is not a QObject, so the signals live in this helper.
+    """
+    progress = pyqtSignal(int)      # number of trends processed so far
+    finished = pyqtSignal(object)   # the value returned by the job
+    failed = pyqtSignal(str)        # the error message
+    cancelled = pyqtSignal()
+
+
+class Task(QRunnable):
+    """
+        Runs a job on the global QThreadPool and reports back through signals.
+
+        The job is called as `job(*args, progress=report)`, it must call
+        `report(count)` from time to time, which is where cancellation happens.
+    """
+    def __init__(self, job, *args):
+        """
+            Initializes the task.
+
+            Args:
+                job: The callable to run outside the GUI thread.
+                args: The positional arguments of the job.
+        """
+        super().__init__()
+        self.job = job
+        self.args = args
+        self.signals = TaskSignals()
+        self._cancelled = False
+        self._stopped = False
+
+    def cancel(self):
+        """
+            Asks the task to stop at the next progress report.
+        """
+        self._cancelled = True
+
+    def report(self, count: int):
+        """
+            Progress callback given to the job.
+
+            Args:
+                count: The number of trends processed so far.
+
+            Raises:
+                Cancelled: If `cancel` was called.
+        """
+        if self._cancelled:
+            self._stopped = True
+            raise Cancelled()
+        self.signals.progress.emit(count)
+
+    def run(self):
+        try:
+            result = self.job(*self.args, progress=self.report)
+        except Cancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+        else:
+            # A job returning its errors (see `manifest.build`) also returns Cancelled
+            if self._stopped:
+                self.signals.cancelled.emit()
+            else:
+                self.signals.finished.emit(result)